@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .cache import is_shared_cache
+
+        # Отозванные JWT хранятся в кэше: в локальном кэше отзыв
+        # не виден другим процессам и теряется при перезапуске
+        if settings.AUTH_MODE == 'jwt' and not is_shared_cache():
+            raise ImproperlyConfigured(
+                'AUTH_MODE=jwt требует общего для процессов кэша: '
+                'задайте CACHE_BACKEND и CACHE_LOCATION, например '
+                'для Memcached'
+            )
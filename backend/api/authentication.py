@@ -0,0 +1,81 @@
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import User
+
+# Поля пользователя, которые передаются в токене и не читаются из БД
+USER_CLAIMS = (
+    'email', 'username', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser',
+)
+REVOKED_TOKEN_KEY = 'jwt-revoked:{}'
+REVOKED_USER_KEY = 'jwt-revoked-user:{}'
+
+
+def get_tokens_for_user(user):
+    """Пара refresh и access токенов с данными пользователя."""
+    refresh = RefreshToken.for_user(user)
+    refresh['iat'] = int(refresh.current_time.timestamp())
+    for field in USER_CLAIMS:
+        refresh[field] = getattr(user, field)
+    return {'auth_token': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+def revoke_token(token):
+    """Отзывает токен до истечения его срока действия."""
+    timeout = token['exp'] - int(time.time())
+    if timeout > 0:
+        cache.set(REVOKED_TOKEN_KEY.format(token[api_settings.JTI_CLAIM]),
+                  True, timeout)
+
+
+def revoke_user_tokens(user):
+    """Отзывает все выданные пользователю токены."""
+    cache.set(REVOKED_USER_KEY.format(user.pk), int(time.time()),
+              int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()))
+
+
+def is_revoked(token):
+    jti_key = REVOKED_TOKEN_KEY.format(token[api_settings.JTI_CLAIM])
+    user_key = REVOKED_USER_KEY.format(token[api_settings.USER_ID_CLAIM])
+    revoked = cache.get_many((jti_key, user_key))
+    if jti_key in revoked:
+        return True
+    # iat хранится с точностью до секунды, поэтому отзываются и токены,
+    # выданные в ту же секунду
+    return user_key in revoked and token.get('iat', 0) <= revoked[user_key]
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Аутентификация по JWT без запроса пользователя из БД.
+
+    Пользователь собирается из полей токена; остальные поля отложены и
+    читаются из БД только при обращении к ним. Токены, не похожие на
+    JWT, пропускаются, чтобы их проверила TokenAuthentication.
+    """
+
+    def get_raw_token(self, header):
+        raw_token = super().get_raw_token(header)
+        if raw_token is None or raw_token.count(b'.') != 2:
+            return None
+        return raw_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            values = [validated_token[field] for field in USER_CLAIMS]
+        except KeyError:
+            raise InvalidToken('В токене нет данных пользователя.')
+        if is_revoked(validated_token):
+            raise InvalidToken('Токен отозван.')
+        data = dict(zip(USER_CLAIMS, values), id=user_id)
+        fields = [field.attname for field in User._meta.concrete_fields
+                  if field.attname in data]
+        return User.from_db(DEFAULT_DB_ALIAS, fields,
+                            [data[field] for field in fields])
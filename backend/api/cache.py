@@ -0,0 +1,128 @@
+import hashlib
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+GENERATION_KEY = 'generation:{}'
+
+# Кэши, содержимое которых видно только одному процессу
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache():
+    """Виден ли кэш по умолчанию всем процессам.
+
+    Поколение, сдвинутое в локальном кэше, не видят другие процессы:
+    зависящие от поколений кэши и реестры включаются только с общим кэшем.
+    """
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def get_generation_key(model):
+    return GENERATION_KEY.format(model._meta.label_lower)
+
+
+def get_generations(models):
+    """Возвращает строку с текущими поколениями данных моделей.
+
+    Вытесненное из кэша поколение заменяется новым, поэтому зависящие
+    от него записи не могут ошибочно остаться актуальными.
+    """
+    keys = [get_generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid4().hex, timeout=None)
+        generations.update(cache.get_many(missing))
+    return '.'.join(str(generations.get(key)) for key in keys)
+
+
+def bump_generation(model):
+    """Сдвигает поколение модели, делая устаревшими зависящие записи."""
+    cache.set(get_generation_key(model), uuid4().hex, timeout=None)
+
+
+def get_or_set_once(key, compute, timeout):
+    """Берёт значение из кэша, вычисляя его не более чем в одном потоке.
+
+    Пока один запрос пересчитывает значение под блокировкой, остальные
+    ждут его появления в кэше. Если блокировка не освобождается за
+    RESPONSE_CACHE_LOCK_TIMEOUT, значение вычисляется без кэша.
+    compute возвращает пару (значение, нужно ли его кэшировать).
+    """
+    lock_key = key + ':lock'
+    lock_timeout = settings.RESPONSE_CACHE_LOCK_TIMEOUT
+    deadline = time.monotonic() + lock_timeout
+    while True:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.add(lock_key, True, lock_timeout):
+            try:
+                value, cacheable = compute()
+                if cacheable:
+                    cache.set(key, value, timeout)
+                return value
+            finally:
+                cache.delete(lock_key)
+        if time.monotonic() >= deadline:
+            return compute()[0]
+        time.sleep(settings.RESPONSE_CACHE_POLL_INTERVAL)
+
+
+class CachedResponseMixin:
+    """Кэширует ответы list и retrieve для анонимных пользователей.
+
+    Ответ кэшируется, только если представление перечисляет в
+    response_cache_models модели, от которых он зависит, а кэш общий для
+    процессов; ключ включает путь, параметры запроса и поколения этих
+    моделей.
+    """
+    response_cache_models = None
+
+    def get_response_cache_key(self, request):
+        if (not self.response_cache_models
+                or not settings.RESPONSE_CACHE_TIMEOUT
+                or request.method not in SAFE_METHODS
+                or request.user.is_authenticated
+                or not is_shared_cache()):
+            return None
+        params = sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params
+        )
+        raw_key = repr((request.path, params,
+                        get_generations(self.response_cache_models)))
+        return 'response:' + hashlib.md5(raw_key.encode()).hexdigest()
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+
+        def compute():
+            response = handler(request, *args, **kwargs)
+            cacheable = response.status_code == status.HTTP_200_OK
+            return (response.status_code, response.data), cacheable
+
+        status_code, data = get_or_set_once(
+            key, compute, settings.RESPONSE_CACHE_TIMEOUT
+        )
+        return Response(data, status=status_code)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request,
+                                        *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request,
+                                        *args, **kwargs)
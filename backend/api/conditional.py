@@ -0,0 +1,61 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+
+from .cache import get_generations, is_shared_cache
+
+
+class ConditionalResponseMixin:
+    """Отвечает 304 Not Modified на условные GET-запросы list и retrieve.
+
+    ETag вычисляется без сериализации и без запросов к БД: по поколениям
+    моделей из etag_models, от которых зависит ответ. Last-Modified не
+    отправляется: ответ зависит и от удалений, и от данных пользователя,
+    которые не выражаются одной датой изменения. С локальным кэшем
+    поколения не видят изменений из других процессов, и ETag не
+    отправляется.
+    """
+    etag_models = ()
+
+    def get_list_state(self):
+        return None
+
+    def get_object_state(self):
+        return self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+    def get_etag(self, request, state):
+        params = sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params
+        )
+        raw_etag = repr((
+            request.path, params, request.accepted_renderer.format,
+            request.user.pk, state, get_generations(self.etag_models),
+        ))
+        return quote_etag(hashlib.md5(raw_etag.encode()).hexdigest())
+
+    def get_conditional_response(self, handler, get_state, request,
+                                 *args, **kwargs):
+        if not is_shared_cache():
+            return handler(request, *args, **kwargs)
+        etag = self.get_etag(request, get_state())
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, self.get_list_state, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, self.get_object_state, request,
+            *args, **kwargs
+        )
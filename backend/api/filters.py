@@ -0,0 +1,55 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q
+from rest_framework.filters import BaseFilterBackend
+
+from recipes.models import Favorite, ShoppingCart, TagRecipe
+
+TRUE_VALUES = ('1', 'true')
+SEARCH_CONFIG = 'russian'
+
+
+class RecipeFilterBackend(BaseFilterBackend):
+    """Фильтры рецептов; каждый сводится к одному предикату без DISTINCT."""
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        user = request.user
+
+        slugs = params.getlist('tags')
+        if slugs:
+            queryset = queryset.filter(Exists(TagRecipe.objects.filter(
+                recipe=OuterRef('pk'), tag__slug__in=slugs
+            )))
+
+        for param, model in (('is_favorited', Favorite),
+                             ('is_in_shopping_cart', ShoppingCart)):
+            if params.get(param, '').lower() not in TRUE_VALUES:
+                continue
+            if not user.is_authenticated:
+                return queryset.none()
+            queryset = queryset.filter(Exists(model.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )))
+
+        author = params.get('author')
+        if author is not None and author.isdigit():
+            queryset = queryset.filter(author=author)
+
+        search = params.get('search', '').strip()
+        if search:
+            queryset = self.search(queryset, search)
+
+        return queryset
+
+    @staticmethod
+    def search(queryset, search):
+        """Полнотекстовый поиск по названию и описанию с ранжированием."""
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=search) | Q(text__icontains=search)
+            )
+        query = SearchQuery(search, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
@@ -0,0 +1,55 @@
+import threading
+from bisect import bisect_left
+from itertools import islice, takewhile
+
+from recipes.models import Ingredient, normalize_name
+from .cache import get_generations
+
+
+class IngredientIndex:
+    """Отсортированный в памяти процесса индекс ингредиентов по названию.
+
+    Индекс строится при первом обращении и перестраивается, когда
+    сдвигается поколение модели Ingredient.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._data = ((), ())
+
+    def build(self):
+        generation = get_generations((Ingredient,))
+        rows = sorted(
+            (normalize_name(name), name, pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        )
+        keys = tuple(row[0] for row in rows)
+        items = tuple(
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, name, pk, measurement_unit in rows
+        )
+        self._data = (keys, items)
+        self._generation = generation
+
+    def get_data(self):
+        if self._generation != get_generations((Ingredient,)):
+            with self._lock:
+                if self._generation != get_generations((Ingredient,)):
+                    self.build()
+        return self._data
+
+    def search(self, prefix='', limit=None):
+        keys, items = self.get_data()
+        prefix = normalize_name(prefix)
+        start = bisect_left(keys, prefix)
+        matches = takewhile(
+            lambda pair: pair[0].startswith(prefix),
+            zip(islice(keys, start, None), islice(items, start, None))
+        )
+        return [item for _, item in islice(matches, limit)]
+
+
+ingredient_index = IngredientIndex()
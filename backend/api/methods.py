@@ -1,21 +1,152 @@
-from django.shortcuts import get_object_or_404
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (BooleanField, Case, Exists, OuterRef, Q, Value,
+                              When)
+from django.http import Http404
 from rest_framework import status
 from rest_framework.response import Response
 
-from recipes.models import Recipe
+from recipes.counters import update_counters
+from recipes.models import (Ingredient, ShoppingCart, ShoppingListItem,
+                            normalize_name)
+from users.models import Follow
+from .signals import schedule_bump
+
+
+def annotate_is_subscribed(queryset, user, author='pk'):
+    """Добавляет к выборке флаг подписки текущего пользователя."""
+    if not user.is_authenticated:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(is_subscribed=Exists(
+        Follow.objects.filter(user=user, author=OuterRef(author))
+    ))
+
+
+def search_ingredients(name, limit):
+    """Ищет ингредиенты: сначала по началу названия, затем по вхождению.
+
+    На Postgres к вхождениям добавляются похожие по триграммам названия,
+    а результат ранжируется по сходству. На остальных СУБД совпадения
+    упорядочиваются по названию. Без name - начало каталога по алфавиту.
+    """
+    name = normalize_name(name)
+    if not name:
+        return Ingredient.objects.order_by('search_name', 'name')[:limit]
+    queryset = Ingredient.objects.annotate(is_prefix=Case(
+        When(search_name__startswith=name, then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    ))
+    if connection.vendor != 'postgresql':
+        return queryset.filter(search_name__contains=name).order_by(
+            '-is_prefix', 'search_name'
+        )[:limit]
+    return queryset.filter(
+        Q(search_name__contains=name) | Q(search_name__trigram_similar=name)
+    ).annotate(
+        similarity=TrigramSimilarity('search_name', name)
+    ).order_by('-is_prefix', '-similarity', 'search_name')[:limit]
+
+
+def relations_created(model, user_id, related_ids):
+    """Действия, которые при создании связей выполняли бы сигналы."""
+    schedule_bump(model)
+    update_counters(model, related_ids, 1)
+    if model is ShoppingCart:
+        ShoppingListItem.objects.add_recipes(user_id, related_ids)
+
+
+def relations_deleted(model, user_id, related_ids):
+    """Действия, которые при удалении связей выполняли бы сигналы."""
+    schedule_bump(model)
+    update_counters(model, related_ids, -1)
+    if model is ShoppingCart:
+        ShoppingListItem.objects.remove_recipes(user_id, related_ids)
+
+
+def insert_relations(model, user_id, field_name, related_ids):
+    """Создаёт связи пользователя с объектами одним запросом.
+
+    Возвращает id объектов, связи с которыми созданы этим запросом:
+    уже существующие связи и несуществующие объекты пропускаются.
+    """
+    field = model._meta.get_field(field_name)
+    related_meta = field.related_model._meta
+    placeholders = ', '.join(['%s'] * len(related_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {model._meta.db_table} (user_id, {field.column}) '
+            f'SELECT %s, {related_meta.pk.column} '
+            f'FROM {related_meta.db_table} '
+            f'WHERE {related_meta.pk.column} IN ({placeholders}) '
+            f'ON CONFLICT (user_id, {field.column}) DO NOTHING '
+            f'RETURNING {field.column}',
+            (user_id, *related_ids)
+        )
+        created = [row[0] for row in cursor.fetchall()]
+    if created:
+        relations_created(model, user_id, created)
+    return created
+
+
+def insert_relation(model, user_id, field_name, related_id):
+    """Создаёт связь пользователя с объектом одним запросом.
+
+    Возвращает False, если связь уже есть; если объекта нет,
+    вызывает Http404.
+    """
+    try:
+        with transaction.atomic():
+            created = bool(insert_relations(model, user_id, field_name,
+                                            (related_id,)))
+    except IntegrityError:
+        # Объект удалён параллельным запросом
+        raise Http404
+    if created:
+        return True
+    related_model = model._meta.get_field(field_name).related_model
+    if not related_model.objects.filter(pk=related_id).exists():
+        raise Http404
+    return False
+
+
+def delete_relations(model, user_id, field_name, related_ids):
+    """Удаляет связи пользователя с объектами одним запросом.
+
+    Возвращает id объектов, связи с которыми удалены.
+    """
+    column = model._meta.get_field(field_name).column
+    placeholders = ', '.join(['%s'] * len(related_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {model._meta.db_table} '
+            f'WHERE user_id = %s AND {column} IN ({placeholders}) '
+            f'RETURNING {column}',
+            (user_id, *related_ids)
+        )
+        deleted = [row[0] for row in cursor.fetchall()]
+    if deleted:
+        relations_deleted(model, user_id, deleted)
+    return deleted
+
+
+def delete_relation(model, user_id, field_name, related_id):
+    """Удаляет связь пользователя с объектом одним запросом."""
+    with transaction.atomic():
+        if not delete_relations(model, user_id, field_name, (related_id,)):
+            raise Http404
 
 
 def custom_post(self, request, pk, serializer):
     user = request.user
     serializer = serializer(data={'recipe_id': pk, 'user_id': user.id})
     serializer.is_valid(raise_exception=True)
-    serializer.save(user=user)
+    serializer.save()
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 def custom_delete(self, request, pk, model):
-    user = request.user
-    recipe = get_object_or_404(Recipe, pk=pk)
-    model = get_object_or_404(model, user=user, recipe=recipe)
-    model.delete()
+    delete_relation(model, request.user.id, 'recipe', pk)
     return Response(status=status.HTTP_204_NO_CONTENT)
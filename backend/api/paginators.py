@@ -1,6 +1,88 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from recipes.paginators import get_estimated_count
+from .cache import get_generations
 
 
 class CustomPageNumberPagination(PageNumberPagination):
+    """Постраничный вывод с кэшированием общего количества объектов.
+
+    Количество кэшируется, только если представление перечисляет в
+    count_cache_models модели, от которых оно зависит. Параметры из
+    count_cache_user_params делают количество зависящим от пользователя;
+    если атрибут не задан, кэш всегда ведётся отдельно по пользователям.
+    """
     page_query_param = 'page'
     page_size_query_param = 'limit'
+    ignored_query_params = ('cursor', 'pagination')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_cache_key = self.get_count_cache_key(request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = Paginator(object_list, per_page)
+        paginator.count = self.get_count(object_list)
+        return paginator
+
+    def get_count_cache_key(self, request, view):
+        models = getattr(view, 'count_cache_models', None)
+        if not models:
+            return None
+        ignored = (self.page_query_param, self.page_size_query_param,
+                   *self.ignored_query_params)
+        params = sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params if key not in ignored
+        )
+        user_params = getattr(view, 'count_cache_user_params', None)
+        user = None
+        if user_params is None or any(key in user_params
+                                      for key, _ in params):
+            user = request.user.pk
+        raw_key = repr((request.path, params, user, get_generations(models)))
+        return 'pagination-count:' + hashlib.md5(raw_key.encode()).hexdigest()
+
+    def get_count(self, queryset):
+        if self.count_cache_key is None:
+            return queryset.count()
+        count = cache.get(self.count_cache_key)
+        if count is None:
+            count = self.get_estimated_count(queryset)
+            if count is None:
+                count = queryset.count()
+            cache.set(self.count_cache_key, count,
+                      settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @staticmethod
+    def get_estimated_count(queryset):
+        return get_estimated_count(
+            queryset, settings.PAGINATION_ESTIMATED_COUNT_THRESHOLD
+        )
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Постраничный вывод рецептов по курсору без COUNT и OFFSET.
+
+    Результаты поиска упорядочены по релевантности: курсор сравнивает
+    только первое поле сортировки, а ранг не уникален, поэтому при
+    поиске используется постраничный вывод по номерам страниц.
+    """
+    page_size_query_param = 'limit'
+    ordering = '-id'
+    mode_query_param = 'pagination'
+    mode = 'cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        if params.get('search', '').strip():
+            return False
+        return (params.get(cls.mode_query_param) == cls.mode
+                or cls.cursor_query_param in params)
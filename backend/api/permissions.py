@@ -16,6 +16,6 @@ class IsAuthorOrAdmin(BasePermission):
             return True
         elif (request.method in ('PUT', 'PATCH', 'DELETE')
                 and request.user.is_authenticated
-                and (request.user == obj.author or request.user.is_admin)):
+                and (request.user == obj.author or request.user.is_staff)):
             return True
         return False
@@ -0,0 +1,118 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый класс выгрузки списка покупок.
+
+    Строки списка - кортежи (название, количество, единица измерения);
+    stream() отдаёт файл по частям для StreamingHttpResponse.
+    """
+    charset = 'utf-8'
+
+    @property
+    def filename(self):
+        return f'shopping_list.{self.format}'
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset or 'utf-8')
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+
+class TxtShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        for name, amount, measurement_unit in rows:
+            yield f'{name} - {amount} {measurement_unit}\n'
+
+
+class Echo:
+    """Буфер, который сразу возвращает записанное, для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+class CsvShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Количество', 'Единица измерения')
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header)
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class PdfShoppingListRenderer(ShoppingListRenderer):
+    """PDF собирается целиком: формат не позволяет отдавать его по частям."""
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+    title = 'Список покупок'
+
+    def stream(self, rows):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        line_height = self.font_size * 1.5
+        pdf.setFont(self.font_name, self.font_size * 1.5)
+        pdf.drawString(self.margin, height - self.margin, self.title)
+        y = height - self.margin - line_height * 2
+        pdf.setFont(self.font_name, self.font_size)
+        for name, amount, measurement_unit in rows:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(self.font_name, self.font_size)
+                y = height - self.margin
+            pdf.drawString(self.margin, y,
+                           f'{name} - {amount} {measurement_unit}')
+            y -= line_height
+        pdf.save()
+        yield buffer.getvalue()
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Без явного ?format= отдаёт список в первом из форматов."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+
+SHOPPING_LIST_RENDERERS = (
+    TxtShoppingListRenderer,
+    CsvShoppingListRenderer,
+    PdfShoppingListRenderer,
+)
@@ -1,10 +1,75 @@
-from django.shortcuts import get_object_or_404
+import base64
+import binascii
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Tag, TagRecipe)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.storage import get_content_hash
 from users.models import Follow, User
+from .authentication import is_revoked
+from .methods import insert_relation
+from .tag_registry import tag_registry
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения рецепта."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for variant, files in value.items():
+            if variant == 'source':
+                continue
+            urls[variant] = {}
+            for ext, name in files.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[variant][ext] = url
+        return urls
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение в base64, имя файла - хеш содержимого.
+
+    Если прислано уже сохранённое изображение (тот же файл или ссылка
+    на него), поле пропускается без проверки и записи на диск.
+    """
+
+    def get_file_name(self, decoded_file):
+        return get_content_hash(decoded_file)
+
+    def is_unchanged(self, data):
+        instance = getattr(self.parent, 'instance', None)
+        current = getattr(instance, self.source, None)
+        if not current or not isinstance(data, str):
+            return False
+        if data == current.name or data.endswith(current.url):
+            return True
+        try:
+            decoded_file = base64.b64decode(data.split(';base64,')[-1])
+        except (TypeError, binascii.Error, ValueError):
+            return False
+        return os.path.basename(current.name).startswith(
+            get_content_hash(decoded_file)
+        )
+
+    def to_internal_value(self, data):
+        if self.is_unchanged(data):
+            raise SkipField()
+        return super().to_internal_value(data)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,7 +81,11 @@ class UserSerializer(serializers.ModelSerializer):
                   'first_name', 'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
+        if not user.is_authenticated:
+            return False
         return Follow.objects.filter(user=user, author=obj).exists()
 
 
@@ -27,15 +96,31 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class TagRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.IntegerField(source='tag.id')
-    name = serializers.ReadOnlyField(source='tag.name')
-    color = serializers.ReadOnlyField(source='tag.color')
-    slug = serializers.ReadOnlyField(source='tag.slug')
+class RecipeTagsField(serializers.ReadOnlyField):
+    """Теги рецепта из реестра тегов вместо запроса к таблице Tag.
 
-    class Meta:
-        model = TagRecipe
-        fields = ('id', 'name', 'color', 'slug',)
+    Реестр сверяется с кэшем один раз за сериализацию: снимок тегов
+    хранится в контексте сериализатора.
+    """
+
+    def get_tags(self):
+        context = self.context
+        if 'tag_registry' not in context:
+            context['tag_registry'] = tag_registry.in_bulk()
+        return context['tag_registry']
+
+    def to_representation(self, value):
+        tags = self.get_tags()
+        return [tags[tag_recipe.tag_id] for tag_recipe in value.all()
+                if tag_recipe.tag_id in tags]
+
+
+class TagIdsField(serializers.ListField):
+    """Теги рецепта списком id."""
+    child = serializers.IntegerField()
+
+    def to_representation(self, value):
+        return [tag.pk for tag in value.all()]
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -59,16 +144,13 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
 
 
 class RecipeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = TagIdsField()
     author = UserSerializer(read_only=True)
     ingredients = IngredientAmountSerializer(
         source='ingredientamount_set',
         many=True,
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -82,14 +164,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = data
         if not tags:
             raise serializers.ValidationError('Нужно выбрать минимум 1 тег')
-        tags_list = []
-        for cur_tag in tags:
-            if cur_tag in tags_list:
-                raise serializers.ValidationError(
-                    'Тег должен быть уникальным'
-                )
-            tags_list.append(cur_tag)
-        return tags_list
+        if len(set(tags)) != len(tags):
+            raise serializers.ValidationError(
+                'Тег должен быть уникальным'
+            )
+        missing = set(tags) - tag_registry.in_bulk().keys()
+        if missing:
+            raise serializers.ValidationError(
+                'Теги не найдены: ' + ', '.join(map(str, sorted(missing)))
+            )
+        return tags
 
     def validate_cooking_time(self, data):
         cocking_time = data
@@ -104,34 +188,77 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Нужно выбрать минимум 1 ингредиент'
             )
-        ingredients_list = []
-        for cur_ingr in ingredients:
-            if cur_ingr in ingredients_list:
-                raise serializers.ValidationError(
-                    'Ингредиенты должны быть уникальны'
-                )
-            if int(cur_ingr['amount'] <= 0):
-                raise serializers.ValidationError(
-                    'Количество ингредиента должно быть > 0'
-                )
-            ingredients_list.append(cur_ingr)
-        return ingredients_list
+        ids = [ingredient['ingredient']['id'] for ingredient in ingredients]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ингредиенты должны быть уникальны'
+            )
+        if any(ingredient['amount'] <= 0 for ingredient in ingredients):
+            raise serializers.ValidationError(
+                'Количество ингредиента должно быть > 0'
+            )
+        missing = set(ids) - Ingredient.objects.in_bulk(ids).keys()
+        if missing:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                + ', '.join(map(str, sorted(missing)))
+            )
+        return ingredients
 
     @staticmethod
     def create_ingredient(ingredients, recipe):
-        ingredient_list = []
-        for ingredient in ingredients:
-            cur_ingr = get_object_or_404(
-                Ingredient, id=ingredient['ingredient']['id']
-            )
-            amount = ingredient['amount']
-            ingredient_list.append(
-                IngredientAmount(recipe=recipe,
-                                 ingredient=cur_ingr,
-                                 amount=amount)
-            )
-        IngredientAmount.objects.bulk_create(ingredient_list)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe,
+                             ingredient_id=ingredient['ingredient']['id'],
+                             amount=ingredient['amount'])
+            for ingredient in ingredients
+        )
 
+    @staticmethod
+    def update_tags(recipe, tags):
+        current = {
+            tag_recipe.tag_id for tag_recipe in recipe.tagrecipe_set.all()
+        }
+        new = set(tags)
+        if new - current:
+            recipe.tags.add(*(new - current))
+        if current - new:
+            recipe.tags.remove(*(current - new))
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        current = {
+            amount.ingredient_id: amount
+            for amount in recipe.ingredientamount_set.all()
+        }
+        new = {
+            ingredient['ingredient']['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        old_amounts = {
+            ingredient: amount.amount for ingredient, amount in current.items()
+        }
+        changed = []
+        for ingredient, amount in new.items():
+            if ingredient in current and current[ingredient].amount != amount:
+                current[ingredient].amount = amount
+                changed.append(current[ingredient])
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredient_id=ingredient,
+                             amount=amount)
+            for ingredient, amount in new.items() if ingredient not in current
+        )
+        IngredientAmount.objects.bulk_update(changed, ('amount',))
+        removed = [
+            amount.id for ingredient, amount in current.items()
+            if ingredient not in new
+        ]
+        if removed:
+            IngredientAmount.objects.filter(id__in=removed).delete()
+        ShoppingListItem.objects.apply_recipe_changes(recipe, old_amounts,
+                                                      new)
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context['request'].user
         ingredients = validated_data.pop('ingredientamount_set')
@@ -141,24 +268,31 @@ class RecipeSerializer(serializers.ModelSerializer):
         self.create_ingredient(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredientamount_set')
-        tags = validated_data.pop('tags')
-        Recipe.objects.filter(id=instance.pk).update(**validated_data)
-        recipe = get_object_or_404(Recipe, id=instance.pk)
-        recipe.tags.remove()
-        IngredientAmount.objects.filter(recipe=instance.pk).delete()
-        TagRecipe.objects.filter(recipe=instance.pk).delete()
-        recipe.tags.set(tags)
-        self.create_ingredient(ingredients, recipe)
-        return recipe
+        ingredients = validated_data.pop('ingredientamount_set', None)
+        tags = validated_data.pop('tags', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        if hasattr(instance, '_prefetched_objects_cache'):
+            instance._prefetched_objects_cache.clear()
+        return instance
+
+    def to_representation(self, instance):
+        prefetch_related_objects([instance], Prefetch(
+            'ingredientamount_set',
+            queryset=IngredientAmount.objects.select_related('ingredient')
+        ))
+        return super().to_representation(instance)
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
-    tags = TagRecipeSerializer(
-        source='tagrecipe_set',
-        many=True,
-    )
+    tags = RecipeTagsField(source='tagrecipe_set')
     author = UserSerializer(read_only=True)
     ingredients = IngredientAmountSerializer(
         source='ingredientamount_set',
@@ -166,14 +300,17 @@ class RecipeListSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'image_variants', 'text', 'cooking_time')
         model = Recipe
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user.id
         recipe = obj.id
         return Favorite.objects.filter(
@@ -181,6 +318,8 @@ class RecipeListSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user.id
         recipe = obj.id
         return ShoppingCart.objects.filter(
@@ -188,31 +327,35 @@ class RecipeListSerializer(serializers.ModelSerializer):
         ).exists()
 
 
-class SubscribeCreateSerializer(serializers.ModelSerializer):
-    user_id = serializers.IntegerField(source='user.id')
-    author_id = serializers.IntegerField(source='author.id')
+class RelationCreateSerializer(serializers.ModelSerializer):
+    """Создание связи пользователя с объектом одним запросом к БД.
 
-    class Meta:
-        model = Follow
-        fields = ('user_id', 'author_id')
+    Повторное создание связи возвращает ошибку conflict_message,
+    отсутствующий объект - 404.
+    """
+    user_id = serializers.IntegerField()
+    related_field = None
+    conflict_message = None
 
     def create(self, validated_data):
-        user = validated_data.get('user')
-        author = get_object_or_404(
-            User,
-            pk=validated_data.get('author').get('id')
-        )
-        return Follow.objects.create(user=user, author=author)
+        model = self.Meta.model
+        related_id = validated_data[f'{self.related_field}_id']
+        if not insert_relation(model, validated_data['user_id'],
+                               self.related_field, related_id):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.conflict_message]
+            })
+        return model(**validated_data)
 
-    def validate(self, attrs):
-        if Follow.objects.filter(
-            author=attrs.get('author').get('id'),
-            user=attrs.get('user').get('id')
-        ):
-            raise serializers.ValidationError(
-                'Подписка уже есть'
-            )
-        return super().validate(attrs)
+
+class SubscribeCreateSerializer(RelationCreateSerializer):
+    author_id = serializers.IntegerField()
+    related_field = 'author'
+    conflict_message = 'Подписка уже есть'
+
+    class Meta:
+        model = Follow
+        fields = ('user_id', 'author_id')
 
 
 class SubscribeListSerializer(serializers.ModelSerializer):
@@ -231,104 +374,102 @@ class SubscribeListSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count',)
 
     def get_is_subscribed(self, obj):
-        user = obj.user
-        author = obj.author
-        return Follow.objects.filter(user=user, author=author).exists()
+        return True
 
     def get_recipes(self, obj):
         author = obj.author
-        recipe = Recipe.objects.filter(author=author)
+        if hasattr(author, 'recipes_page'):
+            recipe = author.recipes_page
+        else:
+            recipe = Recipe.objects.filter(author=author)
         return RecipeInFollowSerializer(recipe, many=True).data
 
     def get_recipes_count(self, obj):
-        author = obj.author
-        return Recipe.objects.filter(author=author).count()
+        return obj.author.recipes_count
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
     image = Base64ImageField(read_only=True, source='recipe.image')
+    image_variants = ImageVariantsField(source='recipe.image_variants')
     cooking_time = serializers.ReadOnlyField(
         source='recipe.cooking_time'
     )
 
     class Meta:
         model = Favorite
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time',)
 
 
-class FavoriteCreateSerializer(serializers.ModelSerializer):
-    recipe_id = serializers.IntegerField(source='recipe.id')
-    user_id = serializers.IntegerField(source='user.id')
+class FavoriteCreateSerializer(RelationCreateSerializer):
+    recipe_id = serializers.IntegerField()
+    related_field = 'recipe'
+    conflict_message = 'Рецепт уже в избранном'
 
     class Meta:
         model = Favorite
         fields = ('recipe_id', 'user_id')
 
-    def create(self, validated_data):
-        recipe = get_object_or_404(
-            Recipe,
-            pk=validated_data.get('recipe').get('id')
-        )
-        user = validated_data.get('user')
-        return Favorite.objects.create(user=user, recipe=recipe)
-
-    def validate(self, attrs):
-        if Favorite.objects.filter(
-            user=attrs.get('user').get('id'),
-            recipe=attrs.get('recipe').get('id')
-        ):
-            raise serializers.ValidationError(
-                'Рецепт уже в избранном'
-            )
-        return super().validate(attrs)
-
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
     image = Base64ImageField(read_only=True, source='recipe.image')
+    image_variants = ImageVariantsField(source='recipe.image_variants')
     cooking_time = serializers.ReadOnlyField(
         source='recipe.cooking_time'
     )
 
     class Meta:
         model = ShoppingCart
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time',)
 
 
-class ShoppingCartCreateSerializer(serializers.ModelSerializer):
-    recipe_id = serializers.IntegerField(source='recipe.id')
-    user_id = serializers.IntegerField(source='user.id')
+class ShoppingCartCreateSerializer(RelationCreateSerializer):
+    recipe_id = serializers.IntegerField()
+    related_field = 'recipe'
+    conflict_message = 'Уже в корзине'
 
     class Meta:
         model = ShoppingCart
         fields = ('recipe_id', 'user_id')
 
-    def create(self, validated_data):
-        recipe = get_object_or_404(
-            Recipe,
-            pk=validated_data.get('recipe').get('id')
-        )
-        user = validated_data.get('user')
-        return ShoppingCart.objects.create(
-            user=user, recipe=recipe
-        )
-
-    def validate(self, attrs):
-        if ShoppingCart.objects.filter(
-            user=attrs.get('user').get('id'),
-            recipe=attrs.get('recipe').get('id')
-        ):
-            raise serializers.ValidationError(
-                'Уже в корзине'
-            )
-        return super().validate(attrs)
-
 
 class RecipeInFollowSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time',)
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_IDS_LIMIT,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate(self, data):
+        try:
+            token = RefreshToken(data['refresh'])
+        except TokenError as error:
+            raise serializers.ValidationError({'refresh': error.args[0]})
+        if is_revoked(token):
+            raise serializers.ValidationError({'refresh': 'Токен отозван.'})
+        user = User.objects.filter(
+            pk=token[jwt_settings.USER_ID_CLAIM], is_active=True
+        ).first()
+        if user is None:
+            raise serializers.ValidationError(
+                {'refresh': 'Пользователь не найден.'}
+            )
+        return {'refresh': token, 'user': user}
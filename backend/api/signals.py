@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from recipes.signals import bulk_changed
+from users.models import Follow, User
+from .cache import bump_generation
+
+CACHED_MODELS = (
+    Recipe, TagRecipe, IngredientAmount, Tag, Favorite, ShoppingCart,
+    Follow, Ingredient, User,
+)
+# Поля, изменение которых не влияет на ответы API
+IGNORED_UPDATE_FIELDS = frozenset(('last_login',))
+
+
+def schedule_bump(model):
+    """Сдвигает поколение после фиксации транзакции.
+
+    Иначе параллельный запрос успел бы закэшировать под новым
+    поколением ещё не зафиксированные данные.
+    """
+    transaction.on_commit(lambda: bump_generation(model))
+
+
+def bump_model_generation(sender, update_fields=None, **kwargs):
+    if update_fields and IGNORED_UPDATE_FIELDS.issuperset(update_fields):
+        return
+    schedule_bump(sender)
+
+
+def bump_through_generation(sender, action, **kwargs):
+    if action.startswith('post_'):
+        schedule_bump(sender)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(bump_model_generation, sender=model)
+    post_delete.connect(bump_model_generation, sender=model)
+    m2m_changed.connect(bump_through_generation, sender=model)
+bulk_changed.connect(bump_model_generation)
@@ -0,0 +1,53 @@
+import threading
+
+from recipes.models import Tag
+from .cache import get_generations, is_shared_cache
+
+
+class TagRegistry:
+    """Теги в памяти процесса.
+
+    Реестр загружается при первом обращении и перечитывается, когда
+    сдвигается поколение модели Tag, то есть после изменения тегов в
+    любом процессе. Без общего кэша поколение не видно другим процессам,
+    и теги читаются из БД при каждом обращении.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._data = ((), {})
+
+    @staticmethod
+    def load():
+        items = tuple(Tag.objects.order_by('id').values(
+            'id', 'name', 'color', 'slug'
+        ))
+        return items, {item['id']: item for item in items}
+
+    def build(self):
+        generation = get_generations((Tag,))
+        self._data = self.load()
+        self._generation = generation
+
+    def get_data(self):
+        if not is_shared_cache():
+            return self.load()
+        if self._generation != get_generations((Tag,)):
+            with self._lock:
+                if self._generation != get_generations((Tag,)):
+                    self.build()
+        return self._data
+
+    def all(self):
+        return list(self.get_data()[0])
+
+    def get(self, pk):
+        return self.get_data()[1].get(pk)
+
+    def in_bulk(self):
+        """Словарь {id: тег} на момент вызова."""
+        return self.get_data()[1]
+
+
+tag_registry = TagRegistry()
@@ -0,0 +1,88 @@
+from tempfile import mkdtemp
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from users.models import Follow, User
+
+# Общий для процессов кэш, как в развёртывании: с ним включаются кэш
+# ответов, ETag, реестр тегов и индекс ингредиентов
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': mkdtemp(prefix='foodgram-cache-'),
+}}
+LOCAL_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+
+
+def create_user(name):
+    return User.objects.create_user(
+        email=f'{name}@example.com', username=name, first_name=name,
+        last_name=name, password='Pass-word-123'
+    )
+
+
+def create_recipe(author, tags, ingredients, name='Рецепт'):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', cooking_time=10,
+        image='recipes/images/test.png'
+    )
+    TagRecipe.objects.bulk_create(
+        TagRecipe(recipe=recipe, tag=tag) for tag in tags
+    )
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=recipe, ingredient=ingredient,
+                         amount=number + 1)
+        for number, ingredient in enumerate(ingredients)
+    )
+    return recipe
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class FoodgramTestCase(APITestCase):
+    """Данные для тестов API: авторы, теги, ингредиенты и рецепты."""
+    recipes_count = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.authors = [create_user(f'author{number}') for number in range(3)]
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(5)
+        ]
+        cls.recipes = [
+            create_recipe(cls.authors[number % 3],
+                          cls.tags[number % 3:number % 3 + 2],
+                          cls.ingredients[number % 3:number % 3 + 3],
+                          f'Рецепт {number}')
+            for number in range(cls.recipes_count)
+        ]
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.user, author=author)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        # В TestCase on_commit не вызывается, и поколения не сдвигаются:
+        # кэш ответов и количеств не должен переживать тест
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def authenticate(self, user=None):
+        token = (Token.objects.get_or_create(user=user)[0] if user
+                 else self.token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
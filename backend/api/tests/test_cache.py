@@ -0,0 +1,75 @@
+from django.test import override_settings
+
+from api.cache import bump_generation
+from recipes.models import Ingredient, Recipe, Tag
+from .base import LOCAL_CACHES, FoodgramTestCase
+from .test_queries import RECIPE_LIST_QUERIES
+
+
+class SharedCacheTests(FoodgramTestCase):
+    """Изменения из другого процесса видны по поколению в общем кэше."""
+
+    def test_tag_change(self):
+        tag = self.tags[0]
+        self.client.get('/api/tags/')
+        # Изменение в другом процессе: запись в БД и сдвиг поколения
+        Tag.objects.filter(pk=tag.pk).update(name='Новое имя')
+        bump_generation(Tag)
+        response = self.client.get(f'/api/tags/{tag.pk}/')
+        self.assertEqual(response.data['name'], 'Новое имя')
+
+    def test_ingredient_change(self):
+        self.client.get('/api/ingredients/', {'name': 'бру'})
+        Ingredient.objects.bulk_create([
+            Ingredient(name='Брусника', measurement_unit='г',
+                       search_name='брусника'),
+        ])
+        bump_generation(Ingredient)
+        response = self.client.get('/api/ingredients/', {'name': 'бру'})
+        self.assertEqual([item['name'] for item in response.data],
+                         ['Брусника'])
+
+    def test_etag_change(self):
+        etag = self.client.get('/api/recipes/')['ETag']
+        bump_generation(Recipe)
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class LocalCacheTests(FoodgramTestCase):
+    """С локальным кэшем процесса данные читаются из БД каждый раз."""
+
+    def test_recipe_list_not_cached(self):
+        self.client.get('/api/recipes/')
+        # Теги рецептов читаются одним запросом на всю страницу; количество
+        # берётся из кэша и устаревает не дольше его таймаута
+        with self.assertNumQueries(RECIPE_LIST_QUERIES - 1):
+            self.assertEqual(self.client.get('/api/recipes/').status_code,
+                             200)
+
+    def test_tag_change(self):
+        tag = self.tags[0]
+        self.client.get('/api/tags/')
+        Tag.objects.filter(pk=tag.pk).update(name='Новое имя')
+        response = self.client.get(f'/api/tags/{tag.pk}/')
+        self.assertEqual(response.data['name'], 'Новое имя')
+
+    def test_ingredient_change(self):
+        self.client.get('/api/ingredients/', {'name': 'бру'})
+        Ingredient.objects.bulk_create([
+            Ingredient(name='Брусника', measurement_unit='г',
+                       search_name='брусника'),
+        ])
+        response = self.client.get('/api/ingredients/', {'name': 'бру'})
+        self.assertEqual([item['name'] for item in response.data],
+                         ['Брусника'])
+
+    def test_no_etag(self):
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipes[0].pk}/',
+                    '/api/tags/', '/api/ingredients/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('ETag'))
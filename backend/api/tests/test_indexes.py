@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.utils.http import urlencode
+
+from api.filters import RecipeFilterBackend
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag, TagRecipe
+from users.models import User
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN для Postgres')
+class FilterIndexTests(TestCase):
+    """Фильтры рецептов читают связи по индексам, без DISTINCT.
+
+    Настройки планировщика не меняются: данных столько, что индексы
+    выигрывают по стоимости, и проверяется план, который выбран бы в
+    работе.
+    """
+    tables = (Recipe, TagRecipe, Favorite, ShoppingCart)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create(
+            User(email=f'user{number}@example.com', username=f'user{number}',
+                 first_name='Имя', last_name='Фамилия', password='!')
+            for number in range(200)
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}',
+                               color=f'#{number:06d}', slug=f'tag{number}')
+            for number in range(20)
+        ]
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author=cls.users[number % 200], name=f'Рецепт {number}',
+                    text='Описание', image='recipes/images/test.png')
+             for number in range(20000)),
+            batch_size=5000
+        )
+        TagRecipe.objects.bulk_create(
+            (TagRecipe(recipe=recipe, tag=cls.tags[(recipe.pk + shift) % 20])
+             for recipe in recipes for shift in (0, 1)),
+            batch_size=5000
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                (model(user=user, recipe=recipe)
+                 for number, user in enumerate(cls.users[:20])
+                 for recipe in recipes[number::40]),
+                batch_size=5000
+            )
+        with connection.cursor() as cursor:
+            for model in cls.tables:
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def explain(self, user=None, **params):
+        request = SimpleNamespace(
+            query_params=QueryDict(urlencode(params, doseq=True)),
+            user=user or AnonymousUser(),
+        )
+        queryset = RecipeFilterBackend().filter_queryset(
+            request, Recipe.objects.all(), view=None
+        )
+        return queryset[:6].explain()
+
+    def assert_plan(self, plan, indexes):
+        self.assertTrue(
+            any(index in plan for index in indexes),
+            f'Ни один из индексов {indexes} не используется:\n{plan}'
+        )
+        self.assertNotIn('Unique', plan)
+        # Таблицу тегов из 20 строк планировщик вправе читать целиком
+        for model in self.tables:
+            self.assertNotIn(f'Seq Scan on {model._meta.db_table}', plan)
+
+    def test_tags(self):
+        self.assert_plan(self.explain(tags=['tag0', 'tag1']),
+                         ('tagrecipe_recipe_tag_idx', 'unique_recipe_tag'))
+
+    def test_author(self):
+        self.assert_plan(self.explain(author=self.users[0].pk),
+                         ('recipe_author_id_idx',))
+
+    def test_favorites(self):
+        self.assert_plan(self.explain(self.users[0], is_favorited=1),
+                         ('unique_fav_recipe',))
+
+    def test_shopping_cart(self):
+        self.assert_plan(self.explain(self.users[0], is_in_shopping_cart=1),
+                         ('unique_recipe_in_shopping_cart',))
@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from .base import FoodgramTestCase
+
+
+class IngredientListTests(FoodgramTestCase):
+    """Список ингредиентов ограничен и с поиском, и без него."""
+
+    def get_names(self, **params):
+        response = self.client.get('/api/ingredients/', params)
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_limit(self):
+        for mode in ('index', 'database'):
+            with self.subTest(mode=mode), override_settings(
+                INGREDIENT_SEARCH_MODE=mode, INGREDIENT_SEARCH_LIMIT=2
+            ):
+                cache.clear()
+                self.assertEqual(self.get_names(),
+                                 ['Ингредиент 0', 'Ингредиент 1'])
+                self.assertEqual(self.get_names(name='ингр'),
+                                 ['Ингредиент 0', 'Ингредиент 1'])
+                self.assertEqual(self.get_names(name='Ингредиент 4'),
+                                 ['Ингредиент 4'])
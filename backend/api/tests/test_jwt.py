@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.views import APIView
+
+from api.authentication import StatelessJWTAuthentication
+from .base import LOCAL_CACHES, SHARED_CACHES, FoodgramTestCase
+
+PASSWORD = 'Pass-word-123'
+
+
+@override_settings(AUTH_MODE='jwt', ROOT_URLCONF='api.tests.urls')
+class JWTTests(FoodgramTestCase):
+    """Вход, обновление и отзыв JWT."""
+
+    def setUp(self):
+        super().setUp()
+        # Классы аутентификации представлений выбираются при импорте
+        # настроек по AUTH_MODE
+        patcher = mock.patch.object(
+            APIView, 'authentication_classes',
+            (StatelessJWTAuthentication, TokenAuthentication)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self):
+        response = self.client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': PASSWORD,
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_me(self, token, prefix='Token'):
+        self.client.credentials(HTTP_AUTHORIZATION=f'{prefix} {token}')
+        return self.client.get('/api/users/me/')
+
+    def refresh(self, refresh):
+        self.client.credentials()
+        return self.client.post('/api/auth/token/refresh/',
+                                {'refresh': refresh})
+
+    def test_login(self):
+        tokens = self.login()
+        for prefix in ('Token', 'Bearer'):
+            with self.subTest(prefix=prefix):
+                response = self.get_me(tokens['auth_token'], prefix)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['email'], self.user.email)
+
+    def test_no_user_query(self):
+        tokens = self.login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {tokens["auth_token"]}'
+        )
+        self.client.get('/api/tags/')
+        # Пользователь берётся из токена, теги - из реестра
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/tags/').status_code, 200)
+
+    def test_refresh(self):
+        tokens = self.login()
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], tokens['refresh'])
+        self.assertEqual(self.get_me(response.data['auth_token']).status_code,
+                         200)
+        # Использованный refresh-токен отозван
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['refresh'], ['Токен отозван.'])
+
+    def test_logout(self):
+        tokens = self.login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {tokens["auth_token"]}'
+        )
+        response = self.client.post('/api/auth/token/logout/',
+                                    {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me(tokens['auth_token']).status_code, 401)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 400)
+
+    def test_set_password(self):
+        tokens = self.login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {tokens["auth_token"]}'
+        )
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': PASSWORD,
+            'new_password': 'New-pass-word-456',
+        })
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me(tokens['auth_token']).status_code, 401)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 400)
+
+    def test_legacy_token(self):
+        response = self.get_me(self.token.key)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], self.user.email)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me(self.token.key).status_code, 401)
+
+    def test_invalid_token(self):
+        self.assertEqual(self.get_me('a.b.c').status_code, 401)
+        self.assertEqual(self.refresh('a.b.c').status_code, 400)
+
+
+@override_settings(AUTH_MODE='jwt')
+class JWTCacheCheckTests(FoodgramTestCase):
+    """Режим JWT требует общего для процессов кэша."""
+
+    def test_local_cache(self):
+        config = apps.get_app_config('api')
+        with override_settings(CACHES=LOCAL_CACHES):
+            with self.assertRaises(ImproperlyConfigured):
+                config.ready()
+        with override_settings(CACHES=SHARED_CACHES):
+            config.ready()
@@ -0,0 +1,115 @@
+from django.core.cache import cache
+
+from .base import FoodgramTestCase
+
+# Запросы к БД при пустом кэше. У авторизованного пользователя к ним
+# добавляется поиск токена.
+RECIPE_LIST_QUERIES = 6
+RECIPE_DETAIL_QUERIES = 5
+USER_LIST_QUERIES = 2
+SUBSCRIPTION_LIST_QUERIES = 3
+
+
+class QueryCountTests(FoodgramTestCase):
+    """Число запросов к БД не зависит от размера страницы."""
+
+    def assert_list_queries(self, url, queries, sizes=(1, 10), **params):
+        for size in sizes:
+            cache.clear()
+            with self.subTest(url=url, limit=size, **params):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        url, {'limit': size, **params}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']),
+                                 min(size, response.data['count']))
+
+    def test_recipe_list_anonymous(self):
+        self.assert_list_queries('/api/recipes/', RECIPE_LIST_QUERIES)
+        self.assert_list_queries('/api/recipes/', RECIPE_LIST_QUERIES,
+                                 tags='tag0')
+        self.assert_list_queries('/api/recipes/', RECIPE_LIST_QUERIES,
+                                 author=self.authors[0].pk)
+
+    def test_recipe_list_authenticated(self):
+        self.authenticate()
+        for params in ({}, {'tags': ['tag0', 'tag1']},
+                       {'is_favorited': 1}, {'is_in_shopping_cart': 1}):
+            self.assert_list_queries('/api/recipes/',
+                                     RECIPE_LIST_QUERIES + 1, **params)
+
+    def test_recipe_list_flags(self):
+        self.authenticate()
+        response = self.client.get('/api/recipes/', {'limit': 10})
+        favorited = {recipe.pk for recipe in self.recipes[::2]}
+        for recipe in response.data['results']:
+            self.assertEqual(recipe['is_favorited'],
+                             recipe['id'] in favorited)
+            self.assertEqual(recipe['is_in_shopping_cart'],
+                             recipe['id'] in favorited)
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['id'] != self.authors[2].pk
+            )
+
+    def test_recipe_detail(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        with self.assertNumQueries(RECIPE_DETAIL_QUERIES):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        cache.clear()
+        self.authenticate()
+        with self.assertNumQueries(RECIPE_DETAIL_QUERIES + 1):
+            response = self.client.get(url)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertEqual(len(response.data['ingredients']), 3)
+        self.assertEqual(len(response.data['tags']), 2)
+
+    def test_cached_anonymous_list(self):
+        self.client.get('/api/recipes/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/recipes/').status_code,
+                             200)
+
+    def test_cached_count(self):
+        self.authenticate()
+        self.client.get('/api/recipes/', {'limit': 1})
+        # Количество и теги берутся из кэша, добавляется поиск токена
+        with self.assertNumQueries(RECIPE_LIST_QUERIES - 1):
+            self.client.get('/api/recipes/', {'limit': 1, 'page': 2})
+
+    def test_not_modified(self):
+        self.authenticate()
+        response = self.client.get('/api/recipes/')
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/api/recipes/', HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_user_list(self):
+        self.authenticate()
+        self.assert_list_queries('/api/users/', USER_LIST_QUERIES + 1,
+                                 sizes=(1, 4))
+
+    def test_user_detail(self):
+        self.authenticate()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/users/{self.authors[0].pk}/')
+        self.assertTrue(response.data['is_subscribed'])
+
+    def test_subscription_list(self):
+        self.authenticate()
+        self.assert_list_queries('/api/users/subscriptions/',
+                                 SUBSCRIPTION_LIST_QUERIES + 1, sizes=(1, 2))
+        self.assert_list_queries('/api/users/subscriptions/',
+                                 SUBSCRIPTION_LIST_QUERIES + 1, sizes=(1, 2),
+                                 recipes_limit=1)
+
+    def test_tags_and_ingredients(self):
+        for url in ('/api/tags/', f'/api/tags/{self.tags[0].pk}/',
+                    '/api/ingredients/', '/api/ingredients/?name=ингр',
+                    f'/api/ingredients/{self.ingredients[0].pk}/'):
+            cache.clear()
+            with self.subTest(url=url), self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientAmount, Recipe, Tag
+from .base import FoodgramTestCase
+
+
+class RecipeWriteTests(FoodgramTestCase):
+    """Проверка тегов и ингредиентов рецепта без запроса на каждый id."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[0]
+        self.authenticate(self.recipe.author)
+
+    def patch(self, tags, ingredients=None):
+        ingredients = ingredients or self.ingredients[:1]
+        return self.client.patch(f'/api/recipes/{self.recipe.pk}/', {
+            'tags': tags,
+            'ingredients': [{'id': getattr(ingredient, 'pk', ingredient),
+                             'amount': 2} for ingredient in ingredients],
+        }, format='json')
+
+    def test_update(self):
+        tags = [self.tags[2].pk, self.tags[0].pk]
+        response = self.patch(tags, self.ingredients[3:])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['tags']), sorted(tags))
+        self.assertEqual(
+            set(self.recipe.tags.values_list('pk', flat=True)), set(tags)
+        )
+        self.assertEqual(
+            set(IngredientAmount.objects.filter(
+                recipe=self.recipe
+            ).values_list('ingredient', flat=True)),
+            {ingredient.pk for ingredient in self.ingredients[3:]}
+        )
+
+    def test_query_count_does_not_depend_on_size(self):
+        tags = self.tags + [
+            Tag.objects.create(name=f'Новый тег {number}',
+                               color=f'#11111{number}', slug=f'new{number}')
+            for number in range(7)
+        ]
+        queries = []
+        for size in (2, len(tags)):
+            # Из одного состояния: один тег и один ингредиент
+            self.patch([tags[0].pk])
+            with CaptureQueriesContext(connection) as captured:
+                response = self.patch([tag.pk for tag in tags[:size]],
+                                      self.ingredients[:size // 2 + 1])
+            self.assertEqual(response.status_code, 200)
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_errors(self):
+        for tags, error in (
+            ([], 'Нужно выбрать минимум 1 тег'),
+            ([self.tags[0].pk, self.tags[0].pk], 'Тег должен быть уникальным'),
+            ([self.tags[0].pk, 10 ** 6, 10 ** 6 + 1],
+             'Теги не найдены: 1000000, 1000001'),
+        ):
+            with self.subTest(tags=tags):
+                response = self.patch(tags)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['tags'], [error])
+        response = self.patch([self.tags[0].pk], [10 ** 6])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ingredients'],
+                         ['Ингредиенты не найдены: 1000000'])
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).name,
+                         self.recipe.name)
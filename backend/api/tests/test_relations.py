@@ -0,0 +1,157 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+from .base import FoodgramTestCase, create_recipe, create_user
+
+MISSING_ID = 10 ** 6
+
+
+class RelationTestCase(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+
+    def assert_no_drift(self, command='reconcile_counters'):
+        output = StringIO()
+        call_command(command, stdout=output)
+        self.assertIn('Расхождений: 0', output.getvalue())
+
+
+class RelationToggleTests(RelationTestCase):
+    """Создание и удаление связей одним запросом: 201, 400 и 404."""
+
+    def assert_toggle(self, url, model, filters, conflict_message):
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(model.objects.filter(**filters).exists())
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'],
+                         [conflict_message])
+        self.assertEqual(model.objects.filter(**filters).count(), 1)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(model.objects.filter(**filters).exists())
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assert_no_drift()
+
+    def test_favorite(self):
+        recipe = self.recipes[1]
+        self.assert_toggle(f'/api/recipes/{recipe.pk}/favorite/', Favorite,
+                           {'user': self.user, 'recipe': recipe},
+                           'Рецепт уже в избранном')
+
+    def test_shopping_cart(self):
+        recipe = self.recipes[1]
+        self.assert_toggle(f'/api/recipes/{recipe.pk}/shopping_cart/',
+                           ShoppingCart, {'user': self.user, 'recipe': recipe},
+                           'Уже в корзине')
+        self.assert_no_drift('reconcile_shopping_lists')
+
+    def test_subscribe(self):
+        author = self.authors[2]
+        self.assert_toggle(f'/api/users/{author.pk}/subscribe/', Follow,
+                           {'user': self.user, 'author': author},
+                           'Подписка уже есть')
+
+    def test_missing_object(self):
+        for url in (f'/api/recipes/{MISSING_ID}/favorite/',
+                    f'/api/recipes/{MISSING_ID}/shopping_cart/',
+                    f'/api/users/{MISSING_ID}/subscribe/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.post(url).status_code, 404)
+                self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_anonymous(self):
+        self.client.credentials()
+        url = f'/api/recipes/{self.recipes[1].pk}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 401)
+
+    def test_counters(self):
+        recipe = self.recipes[1]
+        other = create_user('other')
+        self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.client.post(f'/api/users/{recipe.author_id}/subscribe/')
+        self.client.post(f'/api/users/{other.pk}/subscribe/')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.in_carts_count, 1)
+        self.assertEqual(User.objects.get(pk=other.pk).followers_count, 1)
+        self.assert_no_drift()
+
+
+class BulkRelationTests(RelationTestCase):
+    """Массовое создание и удаление связей со статусом по каждому id."""
+
+    def post(self, url, ids, method='post'):
+        response = getattr(self.client, method)(url, {'ids': ids},
+                                                format='json')
+        self.assertEqual(response.status_code, 200)
+        return {item['id']: item['status']
+                for item in response.data['results']}
+
+    def test_favorites(self):
+        added, existing = self.recipes[1], self.recipes[0]
+        ids = [added.pk, existing.pk, MISSING_ID]
+        self.assertEqual(self.post('/api/recipes/favorite/', ids), {
+            added.pk: 'created', existing.pk: 'exists',
+            MISSING_ID: 'not_found',
+        })
+        self.assertEqual(Recipe.objects.get(pk=added.pk).favorites_count, 1)
+        self.assertEqual(self.post('/api/recipes/favorite/', ids, 'delete'), {
+            added.pk: 'deleted', existing.pk: 'deleted',
+            MISSING_ID: 'not_found',
+        })
+        self.assertFalse(self.user.favorite.filter(
+            recipe__in=(added, existing)
+        ).exists())
+        self.assert_no_drift()
+
+    def test_shopping_cart(self):
+        ids = [recipe.pk for recipe in self.recipes]
+        statuses = self.post('/api/recipes/shopping_cart/', ids)
+        self.assertEqual(list(statuses.values()).count('created'),
+                         len(self.recipes[1::2]))
+        self.assert_no_drift()
+        self.assert_no_drift('reconcile_shopping_lists')
+        self.post('/api/recipes/shopping_cart/', ids[:3], 'delete')
+        self.assert_no_drift()
+        self.assert_no_drift('reconcile_shopping_lists')
+
+    def test_subscribe(self):
+        ids = [self.user.pk, *(author.pk for author in self.authors)]
+        self.assertEqual(self.post('/api/users/subscribe/', ids), {
+            self.user.pk: 'invalid', self.authors[0].pk: 'exists',
+            self.authors[1].pk: 'exists', self.authors[2].pk: 'created',
+        })
+        self.assert_no_drift()
+
+    def test_query_count_does_not_depend_on_ids(self):
+        recipes = [
+            create_recipe(self.authors[0], self.tags[:1], self.ingredients,
+                          f'Новый рецепт {number}')
+            for number in range(6)
+        ]
+        for ids in ([recipes[0].pk], [recipe.pk for recipe in recipes[1:]]):
+            # Токен, точка сохранения, поиск рецептов, вставка, счётчики,
+            # список покупок и снятие точки сохранения
+            with self.subTest(ids=len(ids)), self.assertNumQueries(7):
+                self.post('/api/recipes/shopping_cart/', ids)
+
+    def test_delete_query_count_does_not_depend_on_ids(self):
+        carted = [recipe.pk for recipe in self.recipes[::2]]
+        for ids in (carted[:1], carted[1:]):
+            # Токен, точка сохранения, удаление, счётчики, список покупок
+            # с удалением пустых строк и снятие точки сохранения
+            with self.subTest(ids=len(ids)), self.assertNumQueries(7):
+                statuses = self.post('/api/recipes/shopping_cart/', ids,
+                                     'delete')
+            self.assertEqual(set(statuses.values()), {'deleted'})
+        self.assert_no_drift()
+        self.assert_no_drift('reconcile_shopping_lists')
@@ -0,0 +1,115 @@
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import IngredientAmount, ShoppingCart, ShoppingListItem
+from .base import FoodgramTestCase, create_user
+
+
+class ShoppingListTests(FoodgramTestCase):
+    """Суммарный список покупок следует за корзиной и рецептами."""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+
+    def expected_list(self, user):
+        """Список покупок, посчитанный заново по корзине."""
+        amounts = Counter()
+        for ingredient, amount in IngredientAmount.objects.filter(
+            recipe__in=ShoppingCart.objects.filter(user=user).values('recipe')
+        ).values_list('ingredient', 'amount'):
+            amounts[ingredient] += amount
+        return dict(amounts)
+
+    def assert_list(self, user=None):
+        user = user or self.user
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(user=user).values_list(
+                'ingredient', 'amount'
+            )),
+            self.expected_list(user)
+        )
+        output = StringIO()
+        call_command('reconcile_shopping_lists', stdout=output)
+        self.assertIn('Расхождений: 0', output.getvalue())
+
+    def test_add_and_remove(self):
+        self.assert_list()
+        for recipe in self.recipes[1:4]:
+            self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+            self.assert_list()
+        for recipe in self.recipes:
+            self.client.delete(f'/api/recipes/{recipe.pk}/shopping_cart/')
+            self.assert_list()
+        # Строки с нулевым количеством удаляются
+        self.assertFalse(self.user.shopping_list.exists())
+
+    def test_recipe_update(self):
+        recipe = self.recipes[0]
+        other = create_user('other')
+        self.authenticate(other)
+        self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.authenticate(recipe.author)
+        response = self.client.patch(f'/api/recipes/{recipe.pk}/', {
+            'ingredients': [
+                {'id': self.ingredients[0].pk, 'amount': 7},
+                {'id': self.ingredients[4].pk, 'amount': 3},
+            ],
+            'tags': [self.tags[0].pk],
+            'name': 'Новое название',
+            'text': 'Описание',
+            'cooking_time': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_list(self.user)
+        self.assert_list(other)
+        self.assertEqual(other.shopping_list.get(
+            ingredient=self.ingredients[4]
+        ).amount, 3)
+
+    def test_recipe_delete(self):
+        recipe = self.recipes[0]
+        self.authenticate(recipe.author)
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_list()
+
+    def test_user_delete(self):
+        self.user.delete()
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_download(self):
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        ingredients = {ingredient.pk: ingredient.name
+                       for ingredient in self.ingredients}
+        self.assertEqual(lines, sorted(
+            f'{ingredients[ingredient]} - {amount} г'
+            for ingredient, amount in self.expected_list(self.user).items()
+        ))
+
+    def test_download_csv(self):
+        response = self.client.get('/api/recipes/download_shopping_cart/',
+                                   {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('shopping_list.csv', response['Content-Disposition'])
+
+    def test_reconcile_fix(self):
+        other = create_user('other')
+        ShoppingCart.objects.create(user=other, recipe=self.recipes[1])
+        items = self.user.shopping_list.order_by('ingredient')
+        items.filter(pk=items[0].pk).update(amount=100)
+        items.filter(pk=items[1].pk).delete()
+        ShoppingListItem.objects.create(user=other,
+                                        ingredient=self.ingredients[4],
+                                        amount=5)
+        output = StringIO()
+        call_command('reconcile_shopping_lists', fix=True, batch_size=2,
+                     stdout=output)
+        self.assertIn('Расхождений: 3, исправлены', output.getvalue())
+        self.assert_list()
+        self.assert_list(other)
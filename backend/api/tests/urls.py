@@ -0,0 +1,9 @@
+from django.urls import include, path
+
+from api.urls import jwt_urlpatterns
+from foodgram.urls import urlpatterns
+
+# Маршруты API в режиме AUTH_MODE=jwt
+urlpatterns = [
+    path('api/', include((jwt_urlpatterns, 'api'), namespace='jwt')),
+] + urlpatterns
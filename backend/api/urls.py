@@ -1,13 +1,17 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (FavoriteListViewSet, IngridientViewSet, RecipeViewSet,
-                    ShoppingCartListView, SubscribeListViewSet,
-                    SubscribeViewSet, TagViewSet)
+from .views import (CustomUserViewSet, FavoriteBulkView, FavoriteListViewSet,
+                    IngridientViewSet, JWTLoginView, JWTLogoutView,
+                    JWTRefreshView, RecipeViewSet, ShoppingCartBulkView,
+                    ShoppingCartListView, SubscribeBulkView,
+                    SubscribeListViewSet, SubscribeViewSet, TagViewSet)
 
 app_name = 'api'
 router = DefaultRouter()
 
+router.register('users', CustomUserViewSet, basename='users')
 router.register('ingredients', IngridientViewSet, basename='ingredients')
 router.register('tags', TagViewSet, basename='tags')
 router.register('recipes', RecipeViewSet, basename='recipes')
@@ -16,10 +20,22 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 urlpatterns = [
     path('users/subscriptions/',
          SubscribeListViewSet.as_view({'get': 'list'})),
+    path('users/subscribe/', SubscribeBulkView.as_view()),
     path('users/<int:pk>/subscribe/', SubscribeViewSet.as_view()),
+    path('recipes/favorite/', FavoriteBulkView.as_view()),
+    path('recipes/shopping_cart/', ShoppingCartBulkView.as_view()),
     path('recipes/<int:pk>/favorite/', FavoriteListViewSet.as_view()),
     path('recipes/<int:pk>/shopping_cart/', ShoppingCartListView.as_view()),
-    path('', include('djoser.urls')),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+jwt_urlpatterns = [
+    path('auth/token/login/', JWTLoginView.as_view(), name='login'),
+    path('auth/token/logout/', JWTLogoutView.as_view(), name='logout'),
+    path('auth/token/refresh/', JWTRefreshView.as_view(),
+         name='token_refresh'),
+]
+
+if settings.AUTH_MODE == 'jwt':
+    urlpatterns = jwt_urlpatterns + urlpatterns
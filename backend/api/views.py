@@ -1,95 +1,237 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+from django.http import Http404, StreamingHttpResponse
+from djoser.views import TokenCreateView, TokenDestroyView, UserViewSet
 from rest_framework import status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
 from users.models import Follow, User
-from .methods import custom_delete, custom_post
+from .authentication import (get_tokens_for_user, revoke_token,
+                             revoke_user_tokens)
+from .cache import CachedResponseMixin, is_shared_cache
+from .conditional import ConditionalResponseMixin
+from .filters import RecipeFilterBackend
+from .ingredient_index import ingredient_index
+from .methods import (annotate_is_subscribed, custom_delete, custom_post,
+                      delete_relation, delete_relations, insert_relations,
+                      search_ingredients)
+from .paginators import CustomPageNumberPagination, RecipeCursorPagination
 from .permissions import IsAuthorOrAdmin
-from .serializers import (FavoriteCreateSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeListSerializer,
-                          RecipeSerializer, ShoppingCartCreateSerializer,
-                          ShoppingCartSerializer, SubscribeCreateSerializer,
-                          SubscribeListSerializer, TagSerializer)
+from .renderers import SHOPPING_LIST_RENDERERS, ShoppingListNegotiation
+from .serializers import (BulkIdsSerializer, FavoriteCreateSerializer,
+                          FavoriteSerializer, IngredientSerializer,
+                          RecipeListSerializer, RecipeSerializer,
+                          ShoppingCartCreateSerializer, ShoppingCartSerializer,
+                          SubscribeCreateSerializer, SubscribeListSerializer,
+                          TagSerializer, TokenRefreshSerializer)
+from .tag_registry import tag_registry
 
 
-class IngridientViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(UserViewSet):
+    pagination_class = CustomPageNumberPagination
+
+    def get_permissions(self):
+        if self.action == 'me':
+            return (IsAuthenticated(),)
+        return super().get_permissions()
+
+    def get_queryset(self):
+        queryset = super().get_queryset().order_by('id')
+        return annotate_is_subscribed(queryset, self.request.user)
+
+    def get_instance(self):
+        user = self.request.user
+        if user.get_deferred_fields():
+            return User.objects.get(pk=user.pk)
+        return user
+
+    @action(['post'], detail=False)
+    def set_password(self, request, *args, **kwargs):
+        response = super().set_password(request, *args, **kwargs)
+        revoke_user_tokens(request.user)
+        return response
+
+
+class JWTLoginView(TokenCreateView):
+    """Выдаёт пару JWT вместо токена из БД."""
+
+    def _action(self, serializer):
+        user = serializer.user
+        user_logged_in.send(sender=user.__class__, request=self.request,
+                            user=user)
+        return Response(get_tokens_for_user(user))
+
+
+class JWTRefreshView(views.APIView):
+    """Обменивает refresh-токен на новую пару, отзывая старый."""
+
+    def post(self, request):
+        serializer = TokenRefreshSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke_token(serializer.validated_data['refresh'])
+        return Response(get_tokens_for_user(serializer.validated_data['user']))
+
+
+class JWTLogoutView(TokenDestroyView):
+    """Отзывает текущий JWT и переданный refresh-токен."""
+
+    def post(self, request):
+        if not isinstance(request.auth, AccessToken):
+            return super().post(request)
+        revoke_token(request.auth)
+        try:
+            refresh = RefreshToken(request.data.get('refresh', ''))
+        except TokenError:
+            refresh = None
+        if (refresh is not None
+                and refresh[jwt_settings.USER_ID_CLAIM] == request.user.pk):
+            revoke_token(refresh)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class IngridientViewSet(ConditionalResponseMixin, CachedResponseMixin,
+                        viewsets.ModelViewSet):
     serializer_class = IngredientSerializer
+    queryset = Ingredient.objects.all()
     pagination_class = None
     permission_classes = (IsAuthorOrAdmin,)
+    response_cache_models = (Ingredient,)
+    etag_models = (Ingredient,)
 
-    def get_queryset(self):
-        return Ingredient.objects.filter(
-            name__istartswith=self.request.GET['name']
+    def list(self, request, *args, **kwargs):
+        # Индекс в памяти узнаёт об изменениях из других процессов по
+        # поколению в кэше, поэтому без общего кэша поиск идёт в БД
+        if (settings.INGREDIENT_SEARCH_MODE == 'database'
+                or not is_shared_cache()):
+            return super().list(request, *args, **kwargs)
+        return self.get_conditional_response(
+            self.search_index, self.get_list_state, request
         )
 
+    def search_index(self, request):
+        # Без ?name= отдаётся начало каталога: полный список ингредиентов
+        # слишком велик для одного ответа
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''),
+            settings.INGREDIENT_SEARCH_LIMIT
+        ))
+
+    def get_queryset(self):
+        if self.action != 'list':
+            return Ingredient.objects.all()
+        return search_ingredients(self.request.query_params.get('name', ''),
+                                  settings.INGREDIENT_SEARCH_LIMIT)
+
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalResponseMixin, viewsets.ModelViewSet):
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     pagination_class = None
     permission_classes = (IsAuthorOrAdmin,)
+    etag_models = (Tag,)
 
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.list_registry, self.get_list_state, request
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.retrieve_registry, self.get_object_state, request,
+            *args, **kwargs
+        )
+
+    def list_registry(self, request):
+        return Response(tag_registry.all())
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def retrieve_registry(self, request, pk):
+        tag = tag_registry.get(int(pk)) if pk.isdigit() else None
+        if tag is None:
+            raise Http404
+        return Response(tag)
+
+
+class RecipeViewSet(ConditionalResponseMixin, CachedResponseMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeListSerializer
     permission_classes = (IsAuthorOrAdmin,)
+    count_cache_models = (Recipe, TagRecipe, Favorite, ShoppingCart)
+    response_cache_models = (Recipe, TagRecipe, IngredientAmount, Tag,
+                             Ingredient, User)
+    etag_models = (Recipe, TagRecipe, IngredientAmount, Tag, Ingredient,
+                   User, Favorite, ShoppingCart, Follow)
+    count_cache_user_params = ('is_favorited', 'is_in_shopping_cart')
+    filter_backends = (RecipeFilterBackend,)
 
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH'):
             return RecipeSerializer
         return RecipeListSerializer
 
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and RecipeCursorPagination.is_requested(self.request)):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
     def get_queryset(self):
-        queryset = Recipe.objects.all()
         user = self.request.user
-
-        if self.request.query_params.get('tags') is not None:
-            slug = self.request.query_params.getlist('tags')
-            queryset = queryset.filter(tags__slug__in=slug).distinct()
-
-        if self.request.query_params.get('is_favorited') is not None:
-            recipe = Favorite.objects.filter(user=user).values(
-                'recipe'
+        queryset = Recipe.objects.defer('search_vector').prefetch_related(
+            Prefetch('author', queryset=annotate_is_subscribed(
+                User.objects.all(), user
+            )),
+            Prefetch('tagrecipe_set',
+                     queryset=TagRecipe.objects.only('recipe', 'tag')),
+            Prefetch('ingredientamount_set',
+                     queryset=IngredientAmount.objects.select_related(
+                         'ingredient'
+                     )),
+        )
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            )
+        else:
+            queryset = queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
             )
-            queryset = queryset.filter(id__in=recipe)
-
-        if self.request.query_params.get('is_in_shopping_cart') is not None:
-            recipe = ShoppingCart.objects.filter(user=user).values('recipe')
-            queryset = queryset.filter(id__in=recipe)
-
-        if self.request.query_params.get('author') is not None:
-            pk = self.request.query_params.get('author')
-            queryset = queryset.filter(author=pk)
 
         return queryset
 
     @action(detail=False,
             permission_classes=(IsAuthenticated,),
-            methods=['get'])
+            methods=['get'],
+            renderer_classes=SHOPPING_LIST_RENDERERS,
+            content_negotiation_class=ShoppingListNegotiation)
     def download_shopping_cart(self, request):
-        shopping_list = []
-        user = request.user
-        name = 'recipe__ingredientamount__ingredient__name'
-        unit = 'recipe__ingredientamount__ingredient__measurement_unit'
-        amount = 'recipe__ingredientamount__amount'
-        ingredients = user.shoppingcart.select_related('recipe').values(
-            name, unit
-        ).annotate(Sum(amount))
-        for ingredient in ingredients:
-            shopping_list += (
-                f'{ingredient[name]} - '
-                f'{ingredient["recipe__ingredientamount__amount__sum"]} '
-                f'{ingredient[unit]}'
-                f'\n'
-            )
-        response = HttpResponse(shopping_list,
-                                content_type="text/plain,charset=utf8")
+        renderer = request.accepted_renderer
+        rows = request.user.shopping_list.filter(
+            amount__gt=0
+        ).order_by('ingredient__name').values_list(
+            'ingredient__name', 'amount', 'ingredient__measurement_unit'
+        ).iterator(chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE)
+        response = StreamingHttpResponse(renderer.stream(rows),
+                                         content_type=renderer.content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{renderer.filename}"'
+        )
         return response
 
 
@@ -97,24 +239,15 @@ class SubscribeViewSet(views.APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, pk):
-        user = self.request.user
-        author = get_object_or_404(User, pk=pk)
         serializer = SubscribeCreateSerializer(
-            data={'user_id': user.id, 'author_id': author.id}
+            data={'user_id': request.user.id, 'author_id': pk}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=user)
+        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk):
-        user = self.request.user
-        author = get_object_or_404(User, pk=pk)
-        follow = get_object_or_404(
-            Follow,
-            user=user,
-            author=author
-        )
-        follow.delete()
+        delete_relation(Follow, request.user.id, 'author', pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -122,14 +255,28 @@ class SubscribeListViewSet(viewsets.ModelViewSet):
     serializer_class = SubscribeListSerializer
     permission_classes = (IsAuthenticated,)
     queryset = Follow.objects.all()
+    count_cache_models = (Follow,)
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None or not recipes_limit.isdigit():
+            return None
+        return int(recipes_limit)
 
     def get_queryset(self):
         user = self.request.user
-        queryset = user.follower.all()
-        if self.request.query_params.get('recipes_limit') is not None:
-            recipes_limit = self.request.query_params.get('recipes_limit')
-            queryset = queryset[:int(recipes_limit)]
-        return queryset
+        recipes = Recipe.objects.only(
+            'id', 'author', 'name', 'image', 'image_variants', 'cooking_time'
+        )
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Recipe.objects.filter(
+                author=OuterRef('author')
+            ).values('id')[:recipes_limit])
+        return user.follower.select_related('author').prefetch_related(
+            Prefetch('author__recipes', queryset=recipes,
+                     to_attr='recipes_page')
+        ).order_by('-id')
 
 
 class FavoriteListViewSet(views.APIView):
@@ -154,3 +301,77 @@ class ShoppingCartListView(views.APIView):
 
     def delete(self, request, pk):
         return custom_delete(self, request, pk, ShoppingCart)
+
+
+class BulkRelationView(views.APIView):
+    """Добавление и удаление связей пользователя сразу для списка id.
+
+    Число запросов к БД не зависит от количества id, в ответе - статус
+    по каждому id.
+    """
+    permission_classes = (IsAuthenticated,)
+    model = None
+    related_field = None
+    related_model = None
+
+    def get_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def get_invalid_ids(self, user):
+        return set()
+
+    @staticmethod
+    def get_results(ids, statuses, default):
+        return Response({'results': [
+            {'id': pk, 'status': statuses.get(pk, default)} for pk in ids
+        ]})
+
+    @transaction.atomic
+    def post(self, request):
+        user = request.user
+        ids = self.get_ids(request)
+        found = set(self.related_model.objects.filter(
+            pk__in=ids
+        ).values_list('pk', flat=True))
+        statuses = dict.fromkeys(self.get_invalid_ids(user) & found,
+                                 'invalid')
+        candidates = [pk for pk in ids if pk in found and pk not in statuses]
+        if candidates:
+            # Связи, уже созданные в том числе параллельным запросом,
+            # вставка пропускает и не возвращает
+            statuses.update(dict.fromkeys(candidates, 'exists'))
+            statuses.update(dict.fromkeys(insert_relations(
+                self.model, user.pk, self.related_field, candidates
+            ), 'created'))
+        return self.get_results(ids, statuses, 'not_found')
+
+    @transaction.atomic
+    def delete(self, request):
+        ids = self.get_ids(request)
+        deleted = delete_relations(self.model, request.user.pk,
+                                   self.related_field, ids)
+        return self.get_results(ids, dict.fromkeys(deleted, 'deleted'),
+                                'not_found')
+
+
+class FavoriteBulkView(BulkRelationView):
+    model = Favorite
+    related_field = 'recipe'
+    related_model = Recipe
+
+
+class ShoppingCartBulkView(BulkRelationView):
+    model = ShoppingCart
+    related_field = 'recipe'
+    related_model = Recipe
+
+
+class SubscribeBulkView(BulkRelationView):
+    model = Follow
+    related_field = 'author'
+    related_model = User
+
+    def get_invalid_ids(self, user):
+        return {user.pk}
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -86,6 +88,18 @@ DATABASES = {
 }
 
 
+# Кэш ответов, ETag, реестр тегов и индекс ингредиентов сверяются с
+# поколениями данных в кэше и включаются только с общим для процессов кэшем,
+# например CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache;
+# с локальным кэшем процесса данные читаются из БД при каждом запросе
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -147,6 +161,61 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+# Режим аутентификации: 'token' - токены в БД, 'jwt' - подписанные токены
+# без обращения к БД; в режиме 'jwt' ранее выданные токены продолжают работать
+AUTH_MODE = os.getenv('AUTH_MODE', default='token')
+if AUTH_MODE == 'jwt':
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = (
+        'api.authentication.StatelessJWTAuthentication',
+        'rest_framework.authentication.TokenAuthentication',
+    )
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', default=15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', default=7))),
+    # Фронтенд передаёт токен с префиксом Token
+    'AUTH_HEADER_TYPES': ('Bearer', 'Token'),
+}
+
+# Кэширование количества объектов при постраничном выводе
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', default=60))
+# Размер таблицы, начиная с которого для списков без фильтров берётся оценка
+# планировщика Postgres вместо COUNT(*); пустое значение отключает оценку
+PAGINATION_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('PAGINATION_ESTIMATED_COUNT_THRESHOLD', default=0)) or None
+# То же для списков в админке; 0 отключает оценку
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=10000)) or None
+
+# Кэширование ответов для анонимных пользователей; 0 отключает кэш
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+# Сколько секунд остальные запросы ждут пересчёта ответа одним запросом
+RESPONSE_CACHE_LOCK_TIMEOUT = int(os.getenv('RESPONSE_CACHE_LOCK_TIMEOUT', default=10))
+RESPONSE_CACHE_POLL_INTERVAL = 0.05
+
+# Наибольшее число id в одном запросе на массовое добавление или удаление
+BULK_IDS_LIMIT = int(os.getenv('BULK_IDS_LIMIT', default=100))
+
+# Максимальное число ингредиентов в ответе списка и подсказок поиска
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=30))
+# Режим поиска ингредиентов: 'index' - по началу названия в памяти процесса
+# (только с общим кэшем), 'database' - по началу названия и вхождению
+# средствами СУБД
+INGREDIENT_SEARCH_MODE = os.getenv('INGREDIENT_SEARCH_MODE', default='index')
+
+# Варианты изображений рецептов: наибольшая сторона в пикселях
+RECIPE_IMAGE_VARIANTS = {
+    'card': 400,
+    'list': 800,
+    'full': 1600,
+}
+RECIPE_IMAGE_QUALITY = 82
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', default=2))
+# Обрабатывать изображения в фоновом потоке, а не в ходе запроса
+RECIPE_IMAGE_PROCESSING_ASYNC = os.getenv('RECIPE_IMAGE_PROCESSING_ASYNC', default='True') == 'True'
+
+# Выгрузка списка покупок
+SHOPPING_LIST_CHUNK_SIZE = 2000
+SHOPPING_LIST_PDF_FONT = os.getenv('SHOPPING_LIST_PDF_FONT', default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.UserSerializer',
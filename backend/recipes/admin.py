@@ -1,49 +1,90 @@
 from django.contrib import admin
+from django.core.files.storage import default_storage
 from django.utils.html import format_html
 
 from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                     ShoppingCart, Tag, TagRecipe)
+                     ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from .paginators import EstimatedCountPaginator
 
 
 class IngredientAmountInLine(admin.TabularInline):
     model = IngredientAmount
     extra = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 class TagRecipeInLine(admin.TabularInline):
     model = TagRecipe
     extra = 1
+    autocomplete_fields = ('tag',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('tag')
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'slug',)
+    search_fields = ('name', 'slug',)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'author', 'name', 'image_tag',)
+    list_display = ('id', 'author', 'name', 'image_tag', 'favorites_count',
+                    'in_carts_count',)
+    readonly_fields = ('favorites_count', 'in_carts_count',)
     list_filter = ('tags',)
+    list_select_related = ('author',)
     search_fields = ('author__username', 'name',)
+    autocomplete_fields = ('author',)
     inlines = (IngredientAmountInLine, TagRecipeInLine,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('search_vector')
 
     def image_tag(self, obj):
-        return format_html(f'<img src="{obj.image.url}"'
-                           f'style="width: 45px; height:45px;" />')
+        thumbnail = obj.image_variants.get('card', {}).get('jpeg')
+        url = default_storage.url(thumbnail) if thumbnail else obj.image.url
+        return format_html('<img src="{}" style="width: 45px; '
+                           'height:45px;" loading="lazy" />', url)
     image_tag.short_description = 'Изображение'
 
+    def save_related(self, request, form, formsets, change):
+        old_amounts = dict(IngredientAmount.objects.filter(
+            recipe=form.instance
+        ).values_list('ingredient', 'amount'))
+        super().save_related(request, form, formsets, change)
+        if change:
+            ShoppingListItem.objects.apply_recipe_changes(form.instance,
+                                                          old_amounts)
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit',)
     search_fields = ('name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    autocomplete_fields = ('user', 'recipe',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    autocomplete_fields = ('user', 'recipe',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,38 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Follow
+from .models import Favorite, Recipe, ShoppingCart
+
+# Модель-связь: (поле со ссылкой на объект, счётчик в этом объекте)
+COUNTERS = {
+    Favorite: ('recipe', 'favorites_count'),
+    ShoppingCart: ('recipe', 'in_carts_count'),
+    Follow: ('author', 'followers_count'),
+    Recipe: ('author', 'recipes_count'),
+}
+
+
+def get_related_attname(model):
+    return model._meta.get_field(COUNTERS[model][0]).attname
+
+
+def get_related_model(model):
+    return model._meta.get_field(COUNTERS[model][0]).related_model
+
+
+def update_counters(model, related_ids, delta):
+    """Сдвигает на delta счётчики объектов, на которые ссылается model."""
+    counter = COUNTERS[model][1]
+    get_related_model(model).objects.filter(pk__in=related_ids).update(
+        **{counter: F(counter) + delta}
+    )
+
+
+def get_actual_count(model):
+    """Выражение с фактическим числом строк model для объекта."""
+    field_name = COUNTERS[model][0]
+    return Coalesce(Subquery(
+        model.objects.filter(**{field_name: OuterRef('pk')}).order_by()
+        .values(field_name).annotate(count=Count('pk')).values('count')
+    ), 0)
@@ -0,0 +1,94 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+FORMATS = (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+VARIANTS_PATH = 'recipes/images/variants/{recipe}/{stem}_{variant}.{ext}'
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def needs_processing(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name
+    )
+
+
+def save_variants(recipe, image):
+    """Сохраняет уменьшенные копии изображения без EXIF в WebP и JPEG."""
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    variants = {'source': recipe.image.name}
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variants[variant] = {}
+        for ext, image_format in FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, image_format,
+                         quality=settings.RECIPE_IMAGE_QUALITY)
+            variants[variant][ext] = default_storage.save(
+                VARIANTS_PATH.format(recipe=recipe.pk, stem=stem,
+                                     variant=variant, ext=ext),
+                ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def delete_variants(variants):
+    for variant, files in variants.items():
+        if variant == 'source':
+            continue
+        for name in files.values():
+            default_storage.delete(name)
+
+
+def process_recipe_image(recipe_id, force=False):
+    """Строит варианты изображения рецепта, если они устарели."""
+    recipe = Recipe.objects.only('id', 'image', 'image_variants').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is None or not (force or needs_processing(recipe)):
+        return
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    variants = save_variants(recipe, image)
+    with transaction.atomic():
+        current = Recipe.objects.select_for_update().only(
+            'id', 'image_variants', 'updated_at'
+        ).filter(pk=recipe.pk, image=recipe.image.name).first()
+        if current is not None:
+            current.image_variants = variants
+            current.save(update_fields=('image_variants', 'updated_at'))
+    delete_variants(recipe.image_variants if current else variants)
+
+
+def process_in_background(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_image_processing(recipe_id):
+    if settings.RECIPE_IMAGE_PROCESSING_ASYNC:
+        executor.submit(process_in_background, recipe_id)
+    else:
+        process_recipe_image(recipe_id)
@@ -0,0 +1,99 @@
+import gzip
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import IngredientAmount, Recipe, TagRecipe
+
+RECIPE_FIELDS = ('id', 'name', 'text', 'cooking_time', 'image')
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('name', 'color', 'slug')
+
+
+def open_output(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = ('Выгружает рецепты с автором, тегами и ингредиентами в JSONL: '
+            'по объекту рецепта на строку')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Файл .jsonl или .jsonl.gz; по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько рецептов читать за один запрос',
+        )
+
+    def iter_batches(self, batch_size):
+        recipes = Recipe.objects.order_by('pk').values(
+            *RECIPE_FIELDS,
+            *(f'author__{field}' for field in AUTHOR_FIELDS)
+        ).iterator(chunk_size=batch_size)
+        while True:
+            batch = list(islice(recipes, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def get_related(self, recipe_ids):
+        """Теги и ингредиенты рецептов пакета: по запросу на связь."""
+        tags = defaultdict(list)
+        for recipe_id, *values in TagRecipe.objects.filter(
+            recipe__in=recipe_ids
+        ).order_by('pk').values_list(
+            'recipe', *(f'tag__{field}' for field in TAG_FIELDS)
+        ):
+            tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).order_by('pk').values_list(
+            'recipe', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount'
+        ):
+            ingredients[recipe_id].append({
+                'name': name, 'measurement_unit': unit, 'amount': amount,
+            })
+        return tags, ingredients
+
+    def serialize(self, row, tags, ingredients):
+        recipe = {field: row[field] for field in RECIPE_FIELDS}
+        recipe['author'] = {
+            field: row[f'author__{field}'] for field in AUTHOR_FIELDS
+        }
+        recipe['tags'] = tags[row['id']]
+        recipe['ingredients'] = ingredients[row['id']]
+        return json.dumps(recipe, ensure_ascii=False)
+
+    def handle(self, *args, **options):
+        exported = 0
+        to_stdout = options['path'] == '-'
+        output = self.stdout if to_stdout else open_output(options['path'])
+        try:
+            for batch in self.iter_batches(options['batch_size']):
+                tags, ingredients = self.get_related(
+                    [row['id'] for row in batch]
+                )
+                output.writelines(
+                    self.serialize(row, tags, ingredients) + '\n'
+                    for row in batch
+                )
+                exported += len(batch)
+        finally:
+            if not to_stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported}'
+        ))
@@ -0,0 +1,276 @@
+import csv
+import gzip
+import json
+import sys
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils._os import safe_join
+
+from recipes.counters import update_counters
+from recipes.models import (Ingredient, IngredientAmount, Recipe, Tag,
+                            TagRecipe, normalize_name)
+from recipes.signals import bulk_changed
+from users.models import User
+from .export_recipes import AUTHOR_FIELDS, TAG_FIELDS
+
+REQUIRED_FIELDS = frozenset((
+    'name', 'text', 'cooking_time', 'image', 'author', 'tags', 'ingredients',
+))
+# Наибольшее значение PositiveIntegerField
+MAX_INTEGER = 2 ** 31 - 1
+
+
+def is_text(value, model, field):
+    """Непустая строка, которая помещается в поле модели."""
+    return (isinstance(value, str) and value != ''
+            and len(value) <= model._meta.get_field(field).max_length)
+
+
+def is_positive_integer(value):
+    return (isinstance(value, int) and not isinstance(value, bool)
+            and 0 < value <= MAX_INTEGER)
+
+
+def is_valid_author(author):
+    return (isinstance(author, dict) and 'email' in author
+            and author.keys() <= set(AUTHOR_FIELDS)
+            and all(is_text(value, User, field)
+                    for field, value in author.items()))
+
+
+def is_valid_tag(tag):
+    return (isinstance(tag, dict) and tag.keys() == set(TAG_FIELDS)
+            and all(is_text(value, Tag, field)
+                    for field, value in tag.items()))
+
+
+def is_valid_ingredient(ingredient):
+    return (isinstance(ingredient, dict)
+            and is_text(ingredient.get('name'), Ingredient, 'name')
+            and is_text(ingredient.get('measurement_unit'), Ingredient,
+                        'measurement_unit')
+            and is_positive_integer(ingredient.get('amount')))
+
+
+def is_valid_item(item):
+    """Можно ли записать рецепт без ошибки БД."""
+    return (is_text(item['name'], Recipe, 'name')
+            and isinstance(item['text'], str)
+            and is_text(item['image'], Recipe, 'image')
+            and is_positive_integer(item['cooking_time'])
+            and is_valid_author(item['author'])
+            and isinstance(item['tags'], list)
+            and all(map(is_valid_tag, item['tags']))
+            and isinstance(item['ingredients'], list)
+            and all(map(is_valid_ingredient, item['ingredients'])))
+
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_jsonl(file):
+    """Рецепты из JSONL-файла по одному."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            raise CommandError(f'Строка {number}: некорректный JSON')
+        missing = (REQUIRED_FIELDS - item.keys()
+                   if isinstance(item, dict) else REQUIRED_FIELDS)
+        if missing:
+            raise CommandError(
+                f'Строка {number}: нет полей {", ".join(sorted(missing))}'
+            )
+        yield item
+
+
+class Command(BaseCommand):
+    help = ('Загружает рецепты из JSONL, выгруженного export_recipes, '
+            'пакетами в отдельных транзакциях')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл .jsonl или .jsonl.gz; "-" - stdin',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько рецептов записывать в одной транзакции',
+        )
+        parser.add_argument(
+            '--media-root',
+            help='MEDIA_ROOT источника: скопировать из него изображения',
+        )
+        parser.add_argument(
+            '--create-authors',
+            action='store_true',
+            help='Создать отсутствующих авторов без пароля',
+        )
+        parser.add_argument(
+            '--id-map',
+            help='CSV-файл для пар "старый id,новый id" рецептов',
+        )
+
+    def lookup(self, model, key_fields, keys):
+        rows = model.objects.filter(**{
+            f'{key_fields[0]}__in': {key[0] for key in keys}
+        }).values_list(*key_fields, 'pk')
+        return {
+            tuple(row[:-1]): row[-1] for row in rows
+            if tuple(row[:-1]) in keys
+        }
+
+    def resolve(self, model, key_fields, items, create=True):
+        """{ключ: id} для объектов пакета, недостающие - создаются."""
+        items = {
+            tuple(item[field] for field in key_fields): item
+            for item in items
+        }
+        found = self.lookup(model, key_fields, items)
+        missing = items.keys() - found.keys()
+        if missing and create:
+            model.objects.bulk_create(
+                [model(**items[key]) for key in missing],
+                ignore_conflicts=True
+            )
+            found.update(self.lookup(model, key_fields, missing))
+            bulk_changed.send(sender=model)
+        return found
+
+    def get_references(self, batch, options):
+        authors = self.resolve(User, ('email',), (
+            {**item['author'], 'password': make_password(None)}
+            for item in batch
+        ), create=options['create_authors'])
+        tags = self.resolve(Tag, ('slug',), (
+            tag for item in batch for tag in item['tags']
+        ))
+        ingredients = self.resolve(Ingredient, ('name', 'measurement_unit'), (
+            {'name': ingredient['name'],
+             'measurement_unit': ingredient['measurement_unit'],
+             'search_name': normalize_name(ingredient['name'])}
+            for item in batch for ingredient in item['ingredients']
+        ))
+        return authors, tags, ingredients
+
+    def copy_image(self, name, media_root, storage):
+        try:
+            with open(safe_join(media_root, name), 'rb') as file:
+                return storage.save(name, File(file))
+        except (OSError, SuspiciousFileOperation) as error:
+            raise CommandError(f'Не удалось скопировать {name}: {error}')
+
+    def build_recipes(self, batch, authors, tags, ingredients, options):
+        """Рецепты пакета и их строки тегов и ингредиентов.
+
+        Рецепты, для которых не нашёлся автор, тег или ингредиент,
+        пропускаются.
+        """
+        storage = Recipe._meta.get_field('image').storage
+        recipes = []
+        for item in batch:
+            try:
+                recipe = Recipe(
+                    author_id=authors[(item['author']['email'],)],
+                    name=item['name'],
+                    text=item['text'],
+                    cooking_time=item['cooking_time'],
+                    image=item['image'],
+                )
+                recipe_tags = [tags[(tag['slug'],)] for tag in item['tags']]
+                amounts = {
+                    ingredients[(ingredient['name'],
+                                 ingredient['measurement_unit'])]:
+                    ingredient['amount']
+                    for ingredient in item['ingredients']
+                }
+            except KeyError:
+                continue
+            if options['media_root']:
+                recipe.image = self.copy_image(
+                    item['image'], options['media_root'], storage
+                )
+            recipes.append((item.get('id'), recipe, recipe_tags, amounts))
+        return recipes
+
+    def import_batch(self, batch, options, id_map):
+        # Рецепты с некорректными полями пропускаются, как и рецепты
+        # с ненайденными ссылками: ошибка БД прервала бы весь импорт
+        batch = [item for item in batch if is_valid_item(item)]
+        if not batch:
+            return 0
+        recipes = self.build_recipes(
+            batch, *self.get_references(batch, options), options
+        )
+        Recipe.objects.bulk_create([recipe for _, recipe, _, _ in recipes])
+        TagRecipe.objects.bulk_create([
+            TagRecipe(recipe=recipe, tag_id=tag)
+            for _, recipe, recipe_tags, _ in recipes
+            for tag in set(recipe_tags)
+        ])
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(recipe=recipe, ingredient_id=ingredient,
+                             amount=amount)
+            for _, recipe, _, amounts in recipes
+            for ingredient, amount in amounts.items()
+        ])
+        authors = defaultdict(list)
+        for author, count in Counter(
+            recipe.author_id for _, recipe, _, _ in recipes
+        ).items():
+            authors[count].append(author)
+        for count, author_ids in authors.items():
+            update_counters(Recipe, author_ids, count)
+        for model in (Recipe, TagRecipe, IngredientAmount):
+            bulk_changed.send(sender=model)
+        if id_map:
+            id_map.writerows(
+                (old_id, recipe.pk) for old_id, recipe, _, _ in recipes
+            )
+        return len(recipes)
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                'СУБД не возвращает id при массовой вставке, '
+                'импорт возможен только в PostgreSQL'
+            )
+        imported = skipped = 0
+        file = open_input(options['path'])
+        id_map_file = (open(options['id_map'], 'w', newline='')
+                       if options['id_map'] else None)
+        id_map = csv.writer(id_map_file) if id_map_file else None
+        try:
+            items = iter_jsonl(file)
+            while True:
+                batch = list(islice(items, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    count = self.import_batch(batch, options, id_map)
+                imported += count
+                skipped += len(batch) - count
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            if id_map_file:
+                id_map_file.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {imported}, пропущено: {skipped}. '
+            f'Варианты изображений строит process_recipe_images'
+        ))
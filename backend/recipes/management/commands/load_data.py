@@ -1,22 +1,142 @@
+import csv
 import json
-import os
+from itertools import islice
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from recipes.models import Ingredient
+from recipes.models import Ingredient, normalize_name
+from recipes.signals import bulk_changed
+
+CHUNK_SIZE = 64 * 1024
+FIELDS = ('name', 'measurement_unit')
+
+
+def iter_json(file):
+    """Объекты JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError(f'Ожидается JSON-массив: {file.name}')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError(f'Некорректный JSON: {file.name}')
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_csv(file):
+    """Строки CSV вида "название,единица"; заголовок необязателен."""
+    for number, row in enumerate(csv.reader(file)):
+        if number == 0 and tuple(row[:2]) == FIELDS:
+            continue
+        yield dict(zip(FIELDS, row))
+
+
+READERS = {'.json': iter_json, '.csv': iter_csv}
 
 
 class Command(BaseCommand):
+    help = ('Загружает ингредиенты из JSON или CSV пакетами, добавляя '
+            'новые и обновляя существующие')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Файлы .json или .csv; по умолчанию все файлы из data/',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк записывать за один запрос',
+        )
+
+    def get_paths(self, options):
+        if options['paths']:
+            return [Path(path) for path in options['paths']]
+        return sorted(
+            path for path in (settings.BASE_DIR / 'data').iterdir()
+            if path.suffix in READERS
+        )
+
+    def iter_rows(self, paths):
+        for path in paths:
+            if path.suffix not in READERS:
+                raise CommandError(f'Неизвестный формат файла: {path}')
+            with open(path, encoding='utf-8', newline='') as file:
+                yield from READERS[path.suffix](file)
+
+    def iter_ingredients(self, rows, stats):
+        """Проверенные ингредиенты без повторов."""
+        seen = set()
+        name_length = Ingredient._meta.get_field('name').max_length
+        unit_length = Ingredient._meta.get_field(
+            'measurement_unit'
+        ).max_length
+        for row in rows:
+            name = str(row.get('name') or '').strip()
+            unit = str(row.get('measurement_unit') or '').strip()
+            key = (name, unit)
+            if (not name or not unit or key in seen
+                    or len(name) > name_length or len(unit) > unit_length):
+                stats['skipped'] += 1
+                continue
+            seen.add(key)
+            yield Ingredient(name=name, measurement_unit=unit,
+                             search_name=normalize_name(name))
+
+    def upsert(self, batch, stats):
+        existing = {
+            (ingredient.name, ingredient.measurement_unit): ingredient
+            for ingredient in Ingredient.objects.filter(
+                name__in={ingredient.name for ingredient in batch}
+            ).only('id', 'name', 'measurement_unit', 'search_name')
+        }
+        new = []
+        changed = []
+        for ingredient in batch:
+            current = existing.get((ingredient.name,
+                                    ingredient.measurement_unit))
+            if current is None:
+                new.append(ingredient)
+            elif current.search_name != ingredient.search_name:
+                current.search_name = ingredient.search_name
+                changed.append(current)
+            else:
+                stats['skipped'] += 1
+        Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+        Ingredient.objects.bulk_update(changed, ('search_name',))
+        stats['inserted'] += len(new)
+        stats['updated'] += len(changed)
 
     def handle(self, *args, **options):
-        os.chdir(os.path.join(settings.BASE_DIR, 'data'))
-        for file in os.listdir("."):
-            with open(file, 'r', encoding='utf-8') as f:
-                serialized_ingredients = json.load(f)
-            for ingr in serialized_ingredients:
-                ingredient, created = Ingredient.objects.update_or_create(
-                    name=ingr['name'],
-                    measurement_unit=ingr['measurement_unit'],
-                    defaults={'name': ingr['name'], }
-                )
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        ingredients = self.iter_ingredients(
+            self.iter_rows(self.get_paths(options)), stats
+        )
+        with transaction.atomic():
+            while True:
+                batch = list(islice(ingredients, options['batch_size']))
+                if not batch:
+                    break
+                self.upsert(batch, stats)
+            if stats['inserted'] or stats['updated']:
+                bulk_changed.send(sender=Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            'Добавлено: {inserted}, обновлено: {updated}, '
+            'пропущено: {skipped}'.format(**stats)
+        ))
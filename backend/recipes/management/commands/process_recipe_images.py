@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import needs_processing, process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит варианты изображений рецептов, у которых их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить варианты у всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        recipes = Recipe.objects.only('id', 'image', 'image_variants')
+        for recipe in recipes.iterator():
+            if options['force'] or needs_processing(recipe):
+                process_recipe_image(recipe.pk, force=options['force'])
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}'
+        ))
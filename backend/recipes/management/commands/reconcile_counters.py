@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, get_actual_count
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики рецептов и пользователей с фактическим '
+            'числом связей и при необходимости исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Исправить найденные расхождения',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько объектов сверять за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, (field_name, counter) in COUNTERS.items():
+            total += self.reconcile(model, field_name, counter, options)
+        self.stdout.write(self.style.SUCCESS(
+            f'Расхождений: {total}'
+            + (', исправлены' if total and options['fix'] else '')
+        ))
+
+    def reconcile(self, model, field_name, counter, options):
+        related_model = model._meta.get_field(field_name).related_model
+        actual = get_actual_count(model)
+        drift = 0
+        last_pk = 0
+        while True:
+            rows = list(related_model.objects.filter(
+                pk__gt=last_pk
+            ).order_by('pk').annotate(
+                actual=actual
+            ).values_list('pk', counter, 'actual')[:options['batch_size']])
+            if not rows:
+                return drift
+            last_pk = rows[-1][0]
+            wrong = [(pk, stored, expected)
+                     for pk, stored, expected in rows if stored != expected]
+            for pk, stored, expected in wrong:
+                self.stdout.write(
+                    f'{related_model._meta.verbose_name} {pk}, {counter}: '
+                    f'в счётчике {stored}, ожидается {expected}'
+                )
+            if wrong and options['fix']:
+                related_model.objects.filter(
+                    pk__in=[pk for pk, _, _ in wrong]
+                ).update(**{counter: actual})
+            drift += len(wrong)
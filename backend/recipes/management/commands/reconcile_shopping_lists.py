@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingListItem
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сверяет суммарные списки покупок с содержимым корзин '
+            'и при необходимости исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Исправить найденные расхождения',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько пользователей сверять за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        drift = 0
+        last_pk = 0
+        while True:
+            user_ids = list(User.objects.filter(
+                pk__gt=last_pk
+            ).order_by('pk').values_list(
+                'pk', flat=True
+            )[:options['batch_size']])
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            rows = ShoppingListItem.objects.find_drift(user_ids)
+            for user, ingredient, stored, expected in rows:
+                self.stdout.write(
+                    f'Пользователь {user}, ингредиент {ingredient}: '
+                    f'в списке {stored}, ожидается {expected}'
+                )
+            if rows and options['fix']:
+                # Количества пересчитываются в самих запросах, а не
+                # переносятся из прочитанных выше значений
+                ShoppingListItem.objects.recalculate(
+                    {user for user, _, _, _ in rows}
+                )
+            drift += len(rows)
+        self.stdout.write(self.style.SUCCESS(
+            f'Расхождений: {drift}'
+            + (', исправлены' if drift and options['fix'] else '')
+        ))
@@ -0,0 +1,53 @@
+# Generated by Django 3.2 on 2026-10-18 19:21
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def fill_search_name(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    ingredients = list(Ingredient.objects.all())
+    for ingredient in ingredients:
+        ingredient.search_name = (
+            ingredient.name.strip().casefold().replace('ё', 'е')
+        )
+    Ingredient.objects.bulk_update(ingredients, ('search_name',),
+                                   batch_size=1000)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX ingredient_search_trgm_idx ON recipes_ingredient '
+        'USING gin (search_name gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX ingredient_search_prefix_idx ON recipes_ingredient '
+        '(search_name text_pattern_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_search_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_search_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_auto_20261018_2219'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=150, verbose_name='Название для поиска'),
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2 on 2026-10-18 19:42
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Сливает одинаковые ингредиенты в один, складывая количества."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for row in duplicates.order_by():
+        extra = list(Ingredient.objects.filter(
+            name=row['name'], measurement_unit=row['measurement_unit']
+        ).exclude(pk=row['keep']).values_list('pk', flat=True))
+        for model, owner in ((IngredientAmount, 'recipe_id'),
+                             (ShoppingListItem, 'user_id')):
+            for item in model.objects.filter(ingredient__in=extra):
+                kept = model.objects.filter(
+                    ingredient=row['keep'], **{owner: getattr(item, owner)}
+                ).first()
+                if kept is None:
+                    item.ingredient_id = row['keep']
+                    item.save(update_fields=('ingredient',))
+                else:
+                    kept.amount += item.amount
+                    kept.save(update_fields=('amount',))
+                    item.delete()
+        Ingredient.objects.filter(pk__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0026_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
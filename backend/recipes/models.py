@@ -1,19 +1,42 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models, transaction
 
 from users.models import User
+from .storage import ContentAddressedStorage
+
+
+def normalize_name(value):
+    """Приводит название к виду для поиска: без регистра, ё -> е."""
+    return value.strip().casefold().replace('ё', 'е')
 
 
 class Ingredient(models.Model):
     name = models.CharField('Название', max_length=150)
     measurement_unit = models.CharField('Единица измерения', max_length=100)
+    search_name = models.CharField(
+        'Название для поиска',
+        max_length=150,
+        editable=False,
+        default='',
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_unit'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     name = models.CharField('Название', max_length=100,
@@ -35,6 +58,8 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Автор',
+        # Поиск по полю обслуживает составной индекс из Meta
+        db_index=False,
     )
     name = models.CharField(
         'Название рецепта',
@@ -43,6 +68,12 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Изображение',
         upload_to='recipes/images/',
+        storage=ContentAddressedStorage(),
+    )
+    image_variants = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        editable=False,
     )
     text = models.TextField(
         'Описание',
@@ -61,11 +92,34 @@ class Recipe(models.Model):
         'Время приготовлени мин.',
         default=1
     )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(fields=('author', '-id'),
+                         name='recipe_author_id_idx'),
+        )
 
     def __str__(self) -> str:
         return self.name
@@ -105,11 +159,15 @@ class TagRecipe(models.Model):
         Tag,
         on_delete=models.CASCADE,
         verbose_name='Тег',
+        # Поиск по полю обслуживает составной индекс из Meta
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
-        verbose_name='Рецепт'
+        verbose_name='Рецепт',
+        # Поиск по полю обслуживает составной индекс из Meta
+        db_index=False,
     )
 
     class Meta:
@@ -121,6 +179,10 @@ class TagRecipe(models.Model):
                 name='unique_recipe_tag'
             ),
         )
+        indexes = (
+            models.Index(fields=('recipe', 'tag'),
+                         name='tagrecipe_recipe_tag_idx'),
+        )
 
     def __str__(self) -> str:
         return self.tag.name
@@ -132,6 +194,8 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
         related_name='favorite',
+        # Поиск по полю обслуживает составной индекс из Meta
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -156,6 +220,8 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
         related_name='shoppingcart',
+        # Поиск по полю обслуживает составной индекс из Meta
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -172,3 +238,174 @@ class ShoppingCart(models.Model):
                 name='unique_recipe_in_shopping_cart'
             ),
         )
+
+
+class ShoppingListItemManager(models.Manager):
+    """Поддерживает суммарный список покупок в актуальном состоянии."""
+
+    def _upsert(self, select_sql, params):
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                f'{select_sql} '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {table}.amount + EXCLUDED.amount',
+                params
+            )
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        """Добавляет к списку пользователя ингредиенты рецептов."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        self._upsert(
+            f'SELECT %s, ingredient_id, %s * SUM(amount) '
+            f'FROM {IngredientAmount._meta.db_table} '
+            f'WHERE recipe_id IN ({placeholders}) GROUP BY ingredient_id',
+            (user_id, sign, *recipe_ids)
+        )
+        if sign < 0:
+            self.filter(user=user_id, amount__lte=0).delete()
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        """Добавляет к списку пользователя ингредиенты рецепта."""
+        self.add_recipes(user_id, (recipe_id,), sign)
+
+    def remove_recipes(self, user_id, recipe_ids):
+        """Вычитает из списка пользователя ингредиенты рецептов."""
+        self.add_recipes(user_id, recipe_ids, sign=-1)
+
+    def remove_recipe(self, user_id, recipe_id):
+        """Вычитает из списка пользователя ингредиенты рецепта."""
+        self.add_recipes(user_id, (recipe_id,), sign=-1)
+
+    def remove_deleted_recipe(self, recipe_id):
+        """Вычитает ингредиенты рецепта из всех списков, где он в корзине."""
+        self._upsert(
+            f'SELECT cart.user_id, amount.ingredient_id, -amount.amount '
+            f'FROM {ShoppingCart._meta.db_table} cart '
+            f'JOIN {IngredientAmount._meta.db_table} amount '
+            f'ON amount.recipe_id = cart.recipe_id '
+            f'WHERE cart.recipe_id = %s',
+            (recipe_id,)
+        )
+        self.filter(
+            user__shoppingcart__recipe=recipe_id, amount__lte=0
+        ).delete()
+
+    def apply_recipe_changes(self, recipe, old_amounts, new_amounts=None):
+        """Переносит изменения ингредиентов рецепта во все списки покупок.
+
+        old_amounts и new_amounts - словари {id ингредиента: количество}
+        до и после изменения; без new_amounts состав читается из базы.
+        """
+        if new_amounts is None:
+            new_amounts = dict(IngredientAmount.objects.filter(
+                recipe=recipe
+            ).values_list('ingredient', 'amount'))
+        deltas = [
+            (ingredient, new_amounts.get(ingredient, 0)
+             - old_amounts.get(ingredient, 0))
+            for ingredient in old_amounts.keys() | new_amounts.keys()
+        ]
+        deltas = [delta for delta in deltas if delta[1]]
+        if not deltas:
+            return
+        values = ', '.join(['(%s, %s)'] * len(deltas))
+        self._upsert(
+            f'SELECT cart.user_id, delta.column1, delta.column2 '
+            f'FROM {ShoppingCart._meta.db_table} cart '
+            f'CROSS JOIN (VALUES {values}) delta '
+            f'WHERE cart.recipe_id = %s',
+            [*(value for delta in deltas for value in delta), recipe.pk]
+        )
+        self.filter(
+            user__shoppingcart__recipe=recipe, amount__lte=0
+        ).delete()
+
+    def _cart_totals_sql(self, user_ids, amount='SUM(amount.amount)'):
+        """Запрос сумм ингредиентов из корзин пользователей."""
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        return (
+            f'SELECT cart.user_id, amount.ingredient_id, {amount} '
+            f'FROM {ShoppingCart._meta.db_table} cart '
+            f'JOIN {IngredientAmount._meta.db_table} amount '
+            f'ON amount.recipe_id = cart.recipe_id '
+            f'WHERE cart.user_id IN ({placeholders})'
+        )
+
+    def find_drift(self, user_ids):
+        """Расхождения списков пользователей с содержимым корзин.
+
+        Строки (пользователь, ингредиент, в списке, ожидается); обе
+        стороны читаются одним запросом, то есть из одного снимка.
+        """
+        user_ids = list(user_ids)
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        cart_totals = self._cart_totals_sql(
+            user_ids, '0 AS stored, amount.amount AS expected'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT user_id, ingredient_id, SUM(stored), SUM(expected) '
+                f'FROM ({cart_totals} '
+                f'UNION ALL '
+                f'SELECT user_id, ingredient_id, amount, 0 '
+                f'FROM {self.model._meta.db_table} '
+                f'WHERE user_id IN ({placeholders}) AND amount > 0'
+                f') totals '
+                f'GROUP BY user_id, ingredient_id '
+                f'HAVING SUM(stored) <> SUM(expected) '
+                f'ORDER BY user_id, ingredient_id',
+                user_ids * 2
+            )
+            return cursor.fetchall()
+
+    def recalculate(self, user_ids):
+        """Пересчитывает списки пользователей по содержимому корзин.
+
+        Обнуление блокирует строки списков, и изменения из параллельных
+        транзакций прибавляются уже к пересчитанным количествам.
+        """
+        user_ids = list(user_ids)
+        with transaction.atomic():
+            self.filter(user__in=user_ids).update(amount=0)
+            self._upsert(
+                self._cart_totals_sql(user_ids)
+                + ' GROUP BY cart.user_id, amount.ingredient_id',
+                user_ids
+            )
+            self.filter(user__in=user_ids, amount__lte=0).delete()
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        'Количество',
+        default=0,
+    )
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Продукт в списке покупок'
+        verbose_name_plural = 'Продукты в списках покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_ingredient'
+            ),
+        )
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def get_estimated_count(queryset, threshold):
+    """Оценка планировщика Postgres для больших нефильтрованных таблиц."""
+    connection = connections[queryset.db]
+    if (threshold is None or queryset.query.where
+            or connection.vendor != 'postgresql'):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class '
+            'WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < threshold:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Постраничный вывод админки без COUNT(*) по большим таблицам."""
+
+    @cached_property
+    def count(self):
+        count = get_estimated_count(self.object_list,
+                                    settings.ADMIN_ESTIMATED_COUNT_THRESHOLD)
+        if count is None:
+            return super().count
+        return count
@@ -0,0 +1,111 @@
+from threading import local
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import Signal, receiver
+
+from users.models import User
+from .counters import (COUNTERS, get_related_attname, get_related_model,
+                       update_counters)
+from .images import needs_processing, schedule_image_processing
+from .models import Recipe, ShoppingCart, ShoppingListItem
+
+# Массовое изменение строк модели sender в обход сигналов по строкам
+bulk_changed = Signal()
+
+
+class DeletingObjects(local):
+    """Объекты, удаляемые в текущем потоке.
+
+    При каскадном удалении pre_delete объекта приходит раньше post_delete
+    его связей, а сам объект удаляется после них: пока он отмечен здесь,
+    обновлять относящиеся к нему счётчики незачем.
+    """
+
+    def __init__(self):
+        self.keys = set()
+
+    def __contains__(self, key):
+        return key in self.keys
+
+
+deleting = DeletingObjects()
+
+
+def mark_deleting(sender, instance, **kwargs):
+    deleting.keys.add((sender, instance.pk))
+
+
+def unmark_deleting(sender, instance, **kwargs):
+    deleting.keys.discard((sender, instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if needs_processing(instance):
+        transaction.on_commit(
+            lambda: schedule_image_processing(instance.pk)
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(instance.user_id,
+                                            instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    if ((Recipe, instance.recipe_id) in deleting
+            or (User, instance.user_id) in deleting):
+        return
+    ShoppingListItem.objects.remove_recipe(instance.user_id,
+                                           instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    # Одним запросом для всех корзин: строки корзин и ингредиентов рецепта
+    # удаляются каскадом уже после pre_delete
+    ShoppingListItem.objects.remove_deleted_recipe(instance.pk)
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(sender, (getattr(instance,
+                                         get_related_attname(sender)),), 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    related_id = getattr(instance, get_related_attname(sender))
+    if (get_related_model(sender), related_id) not in deleting:
+        update_counters(sender, (related_id,), -1)
+
+
+def count_moved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Переносит единицу счётчика, если связь перевели на другой объект."""
+    field_name = COUNTERS[sender][0]
+    attname = get_related_attname(sender)
+    if (raw or instance.pk is None or update_fields is not None
+            and not {field_name, attname} & set(update_fields)):
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list(
+        attname, flat=True
+    ).first()
+    new = getattr(instance, attname)
+    if old is not None and old != new:
+        update_counters(sender, (old,), -1)
+        update_counters(sender, (new,), 1)
+
+
+for model in COUNTERS:
+    pre_save.connect(count_moved, sender=model)
+    post_save.connect(count_created, sender=model)
+    post_delete.connect(count_deleted, sender=model)
+for model in {get_related_model(model) for model in COUNTERS}:
+    pre_delete.connect(mark_deleting, sender=model)
+    post_delete.connect(unmark_deleting, sender=model)
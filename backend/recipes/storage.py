@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+def get_content_hash(content):
+    """SHA-256 содержимого: байтов или файла."""
+    if isinstance(content, bytes):
+        return hashlib.sha256(content).hexdigest()
+    digest = hashlib.sha256()
+    if content.seekable():
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if content.seekable():
+        content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по хешу их содержимого.
+
+    Одинаковые файлы хранятся в одном экземпляре: если файл с таким
+    содержимым уже есть, запись пропускается и возвращается его имя.
+    """
+
+    def get_content_name(self, name, content):
+        directory, file_name = os.path.split(name)
+        extension = os.path.splitext(file_name)[1].lower()
+        content_hash = get_content_hash(content)
+        return os.path.join(directory, content_hash[:2],
+                            content_hash + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
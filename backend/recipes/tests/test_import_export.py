@@ -0,0 +1,129 @@
+import csv
+import gzip
+import json
+from copy import deepcopy
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from api.tests.base import create_recipe, create_user
+from recipes.management.commands.import_recipes import is_valid_item
+from recipes.models import Ingredient, Recipe, Tag
+
+
+def describe(recipe):
+    """Рецепт без id: для сравнения до выгрузки и после загрузки."""
+    return (
+        recipe.name, recipe.author.email, recipe.cooking_time,
+        sorted(recipe.tags.values_list('slug', flat=True)),
+        sorted(recipe.ingredientamount_set.values_list(
+            'ingredient__name', 'amount'
+        )),
+    )
+
+
+class ExportImportTests(TestCase):
+    """Выгрузка рецептов в JSONL и загрузка обратно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.recipes = [
+            create_recipe(cls.author, tags[:number + 1],
+                          ingredients[number:], f'Рецепт {number}')
+            for number in range(2)
+        ]
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def export(self):
+        path = self.directory / 'recipes.jsonl.gz'
+        call_command('export_recipes', str(path), batch_size=1,
+                     stderr=StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_export(self):
+        items = self.export()
+        self.assertEqual([item['id'] for item in items],
+                         [recipe.pk for recipe in self.recipes])
+        item = items[1]
+        self.assertEqual(item['author']['email'], self.author.email)
+        self.assertEqual([tag['slug'] for tag in item['tags']],
+                         ['tag0', 'tag1'])
+        self.assertEqual(
+            [(ingredient['name'], ingredient['amount'])
+             for ingredient in item['ingredients']],
+            [('Ингредиент 1', 1), ('Ингредиент 2', 2)]
+        )
+        self.assertTrue(all(map(is_valid_item, items)))
+
+    def test_invalid_items(self):
+        item = self.export()[0]
+        for path, value in (
+            (('cooking_time',), 0),
+            (('cooking_time',), '10'),
+            (('cooking_time',), True),
+            (('ingredients', 0, 'amount'), -1),
+            (('ingredients', 0, 'amount'), 2 ** 31),
+            (('name',), 'Р' * 151),
+            (('name',), ''),
+            (('tags', 0, 'color'), None),
+            (('author', 'password'), 'secret'),
+        ):
+            invalid = deepcopy(item)
+            target = invalid
+            for key in path[:-1]:
+                target = target[key]
+            target[path[-1]] = value
+            with self.subTest(path=path, value=value):
+                self.assertFalse(is_valid_item(invalid))
+
+    @skipUnless(connection.features.can_return_rows_from_bulk_insert,
+                'Импорт возможен только в PostgreSQL')
+    def test_round_trip(self):
+        items = self.export()
+        expected = {recipe.pk: describe(recipe) for recipe in self.recipes}
+        invalid = deepcopy(items[0])
+        invalid['ingredients'][0]['amount'] = 0
+        path = self.directory / 'import.jsonl'
+        path.write_text(''.join(
+            json.dumps(item, ensure_ascii=False) + '\n'
+            for item in (*items, invalid)
+        ), encoding='utf-8')
+        Recipe.objects.all().delete()
+
+        id_map = self.directory / 'map.csv'
+        output = StringIO()
+        call_command('import_recipes', str(path), batch_size=2,
+                     id_map=str(id_map), stdout=output)
+        self.assertIn('Загружено рецептов: 2, пропущено: 1',
+                      output.getvalue())
+        with open(id_map, newline='') as file:
+            pairs = {int(old): int(new) for old, new in csv.reader(file)}
+        self.assertEqual(pairs.keys(), expected.keys())
+        for old_id, new_id in pairs.items():
+            self.assertEqual(describe(Recipe.objects.get(pk=new_id)),
+                             expected[old_id])
+
+        output = StringIO()
+        call_command('reconcile_counters', stdout=output)
+        self.assertIn('Расхождений: 0', output.getvalue())
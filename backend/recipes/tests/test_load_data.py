@@ -0,0 +1,76 @@
+import json
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.tests.base import SHARED_CACHES
+from recipes.models import Ingredient
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class LoadDataTests(TestCase):
+    """Загрузка ингредиентов из JSON и CSV."""
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def load(self, *paths, batch_size=2):
+        output = StringIO()
+        call_command('load_data', *paths, batch_size=batch_size,
+                     stdout=output)
+        return output.getvalue().strip()
+
+    def test_json(self):
+        path = self.write('ingredients.json', json.dumps([
+            {'name': 'Соль', 'measurement_unit': 'г'},
+            {'name': 'Соль', 'measurement_unit': 'г'},
+            {'name': 'Соль', 'measurement_unit': 'щепотка'},
+            {'name': '', 'measurement_unit': 'г'},
+            {'name': 'Ёрш', 'measurement_unit': 'шт'},
+        ], ensure_ascii=False))
+        self.assertEqual(self.load(path),
+                         'Добавлено: 3, обновлено: 0, пропущено: 2')
+        self.assertEqual(
+            Ingredient.objects.get(name='Ёрш').search_name, 'ерш'
+        )
+
+    def test_csv(self):
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        path = self.write('ingredients.csv', (
+            'name,measurement_unit\n'
+            'Соль,г\n'
+            'Перец,г\n'
+            'Перец,г\n'
+            'Без единицы\n'
+        ))
+        self.assertEqual(self.load(path),
+                         'Добавлено: 1, обновлено: 0, пропущено: 3')
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_update(self):
+        Ingredient.objects.create(name='Мука', measurement_unit='г')
+        Ingredient.objects.update(search_name='устарело')
+        path = self.write('ingredients.csv', 'Мука,г\nМука,г\n')
+        self.assertEqual(self.load(path, batch_size=1),
+                         'Добавлено: 0, обновлено: 1, пропущено: 1')
+        self.assertEqual(Ingredient.objects.get().search_name, 'мука')
+
+    def test_search_index(self):
+        """Загруженные ингредиенты видны индексу веб-процесса."""
+        self.client.get('/api/ingredients/', {'name': 'кар'})
+        path = self.write('ingredients.csv', 'Картофель,г\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load(path)
+        response = self.client.get('/api/ingredients/', {'name': 'кар'})
+        self.assertEqual([item['name'] for item in response.json()],
+                         ['Картофель'])
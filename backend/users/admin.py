@@ -1,14 +1,23 @@
 from django.contrib import admin
 
+from recipes.paginators import EstimatedCountPaginator
 from .models import Follow, User
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'username', 'first_name', 'last_name',)
+    list_display = ('id', 'username', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count',)
+    readonly_fields = ('recipes_count', 'followers_count',)
     search_fields = ('email', 'username',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
+    list_select_related = ('user', 'author',)
+    autocomplete_fields = ('user', 'author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False